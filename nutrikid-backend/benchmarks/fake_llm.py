@@ -0,0 +1,175 @@
+# Local stand-in for the hosted LLMs used by main.py.
+#
+# Serves the two wire formats the app's clients speak:
+# - POST /v1/chat/completions                        (InferenceClient.chat_completion with base_url)
+# - POST /v1beta/models/{model}:generateContent       (google-genai Client with http_options.base_url)
+#
+# Point the API at it with HF_BASE_URL / GEMINI_BASE_URL (see benchmarks/README.md).
+# Latency = base latency + jitter + generated tokens / token rate; a share of calls
+# can be made to fail with 503 to exercise the Gemini fallback and error paths.
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+CONFIG = {
+    "latency_ms": 300.0,
+    "jitter_ms": 100.0,
+    "tokens_per_second": 60.0,
+    "failure_rate": 0.0,
+    "seed": None,
+}
+STATS = {"chat_completion": 0, "generate_content": 0, "failures": 0}
+
+_rng = random.Random()
+
+app = FastAPI()
+
+ANSWER = (
+    "Offer iron-rich foods like dal, spinach and jaggery with a source of vitamin C such as "
+    "lemon or guava so the iron is absorbed well. Keep portions small and regular."
+)
+
+KID_ANSWER = (
+    "Hey superstar! 🦸 Carrots are full of vitamin A, the power that helps your eyes see in the dark "
+    "like a night-time hero! 🥕✨ Crunch some at lunch and power up!"
+)
+
+
+def _fake_analysis() -> dict:
+    return {
+        "analysis_summary": "Intake covers energy needs but iron and calcium are below the RDA.",
+        "deficiencies": [
+            {"nutrient": "Iron", "status": "Low", "current_estimated": "5mg", "target": "10mg",
+             "suggestion": "Add spinach or lentils"},
+            {"nutrient": "Calcium", "status": "Very Low", "current_estimated": "200mg", "target": "600mg",
+             "suggestion": "Add a glass of milk or curd"},
+        ],
+        "score": 72,
+    }
+
+
+def _fake_plan(duration: int) -> dict:
+    days = {}
+    for i in range(1, duration + 1):
+        days[f"day_{i}"] = {
+            "breakfast": "Ragi dosa with peanut chutney",
+            "lunch": "Palak dal, brown rice and cucumber raita",
+            "dinner": "Vegetable khichdi with curd",
+            "snacks": "Guava slices and roasted chana",
+            "nutrient_focus": ["Iron", "Calcium"],
+        }
+    return {
+        "weekly_summary": "Iron and calcium rich Indian meals spread across the day.",
+        "expected_improvements": {"Iron": "High", "Calcium": "Moderate"},
+        "plan_score": {"nutrition_score": 86, "diversity_score": 82, "overall_score": 84},
+        "days": days,
+    }
+
+
+def fake_completion(prompt: str) -> str:
+    """Picks a response shaped like what the real model returns for each app prompt."""
+    if "Clinical Pediatric Nutritionist" in prompt:
+        return "```json\n" + json.dumps(_fake_analysis(), indent=2) + "\n```"
+    match = re.search(r"(\d+)-Day Meal Plan", prompt)
+    if match:
+        return json.dumps(_fake_plan(int(match.group(1))))
+    if "Food Buddy" in prompt:
+        return KID_ANSWER
+    return f"{ANSWER}\n|||DETAILED|||\n### Why it matters\n- **Iron** supports growth and focus.\n- {ANSWER}"
+
+
+async def _simulate(kind: str, prompt: str):
+    """Returns (text, None) or (None, error response) after the configured delay."""
+    STATS[kind] += 1
+    text = fake_completion(prompt)
+    tokens = max(1, len(text) // 4)
+    delay = CONFIG["latency_ms"] + _rng.uniform(0, CONFIG["jitter_ms"])
+    delay += tokens / CONFIG["tokens_per_second"] * 1000 if CONFIG["tokens_per_second"] > 0 else 0
+    await asyncio.sleep(delay / 1000)
+
+    if _rng.random() < CONFIG["failure_rate"]:
+        STATS["failures"] += 1
+        return None, JSONResponse(status_code=503, content={"error": "Injected failure (fake_llm)"})
+    return text, None
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt = "\n".join(m.get("content", "") for m in body.get("messages", []) if isinstance(m.get("content"), str))
+    text, error = await _simulate("chat_completion", prompt)
+    if error:
+        return error
+    return {
+        "id": f"fake-{int(time.time() * 1000)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model") or "fake-llm",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                  "total_tokens": (len(prompt) + len(text)) // 4},
+    }
+
+
+@app.post("/{version}/models/{model_action}")
+async def generate_content(version: str, model_action: str, request: Request):
+    if not model_action.endswith(":generateContent"):
+        return JSONResponse(status_code=404, content={"error": f"Unsupported action: {model_action}"})
+    body = await request.json()
+    contents = [body.get("systemInstruction") or {}] + body.get("contents", [])
+    prompt = "\n".join(
+        part.get("text", "")
+        for content in contents
+        for part in content.get("parts", [])
+    )
+    text, error = await _simulate("generate_content", prompt)
+    if error:
+        return error
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4,
+                          "totalTokenCount": (len(prompt) + len(text)) // 4},
+        "modelVersion": model_action.split(":")[0],
+    }
+
+
+@app.get("/stats")
+async def stats():
+    return {"config": CONFIG, **STATS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake HF / Gemini LLM server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=CONFIG["jitter_ms"])
+    parser.add_argument("--tokens-per-second", type=float, default=CONFIG["tokens_per_second"],
+                        help="Generation speed; 0 disables the per-token delay")
+    parser.add_argument("--failure-rate", type=float, default=CONFIG["failure_rate"],
+                        help="Fraction of calls answered with HTTP 503")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    CONFIG.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+    )
+    _rng.seed(args.seed)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import json
+import time
+import tracemalloc
+
+from models import DietPlanRequest
+from services.nutrition_analysis import calculate_deficiencies_from_names, analyze_trends_from_dates
+from benchmarks.payloads import PROFILE, make_rows, to_columns
+
+# Measures parse + analyze cost of the row (meal_logs) and columnar (meal_columns)
+# encodings of /generate-adaptive-plan, as JSON and msgpack.
+# Run from nutrikid-backend/: python -m benchmarks.ingestion
+
+
+def parse_and_analyze(body: bytes, decode):
+    request = DietPlanRequest(**decode(body))
+    if request.meal_columns is not None:
+        names, dates = request.meal_columns.names, request.meal_columns.dates
+    else:
+        names = [m.name for m in request.meal_logs]
+        dates = [m.date for m in request.meal_logs]
+    calculate_deficiencies_from_names(names, request.child_profile.age)
+    analyze_trends_from_dates(dates)
+    return request
+
+
+def measure(label: str, body: bytes, decode, iterations: int):
+    parse_and_analyze(body, decode)  # warm up
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse_and_analyze(body, decode)
+    elapsed_ms = (time.perf_counter() - start) / iterations * 1000
+
+    # Blocks still held by the parsed request (the per-item object churn) plus peak traced memory
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    request = parse_and_analyze(body, decode)
+    after = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    allocations = sum(s.count_diff for s in after.compare_to(before, "filename") if s.count_diff > 0)
+    del request
+
+    print(f"{label:<22} {len(body):>9} {elapsed_ms:>10.3f} {allocations:>12} {peak / 1024:>10.1f}")
+
+
+def main(days: int = 30, iterations: int = 200):
+    rows = make_rows(days)
+    row_payload = {"child_profile": PROFILE, "meal_logs": rows}
+    col_payload = {"child_profile": PROFILE, "meal_columns": to_columns(rows)}
+
+    print(f"Ingestion benchmark: {len(rows)} meals ({days} days), {iterations} iterations")
+    print(f"{'encoding':<22} {'bytes':>9} {'ms/req':>10} {'live blocks':>12} {'peak KiB':>10}")
+
+    measure("json rows", json.dumps(row_payload).encode(), json.loads, iterations)
+    measure("json columns", json.dumps(col_payload).encode(), json.loads, iterations)
+
+    try:
+        import msgpack
+    except ImportError:
+        print("msgpack not installed; skipping msgpack encodings.")
+        return
+
+    unpack = lambda b: msgpack.unpackb(b, raw=False)
+    measure("msgpack rows", msgpack.packb(row_payload), unpack, iterations)
+    measure("msgpack columns", msgpack.packb(col_payload), unpack, iterations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Row vs columnar meal-log ingestion benchmark")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    main(args.days, args.iterations)
@@ -0,0 +1,140 @@
+import argparse
+import json
+import random
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.payloads import ask_payload, analyze_payload, plan_payload
+from benchmarks.report import add_baseline_args, finish, print_table, summarize
+
+# Closed-loop load generator for the AI API. Payloads are generated up front from a seed,
+# so two runs with the same arguments send exactly the same requests.
+# Run from nutrikid-backend/: python -m benchmarks.load_test --url http://127.0.0.1:8000
+
+
+# /ask answers with this (without calling the LLM) when the RAG index files are missing
+MOCK_PREFIX = "(Mock Response)"
+
+
+def _answer_ok(body: dict) -> bool:
+    answer = str(body.get("answer", ""))
+    return not (answer.startswith("Error") or answer.startswith(MOCK_PREFIX))
+
+
+def _plan_ok(body: dict) -> bool:
+    return body.get("status") != "FAILED"
+
+
+# name -> (path, payload factory, response check)
+SCENARIOS: Dict[str, Tuple[str, Callable[[random.Random], dict], Callable[[dict], bool]]] = {
+    "ask_parent": ("/ask", lambda rng: ask_payload(rng, "parent"), _answer_ok),
+    "ask_kid": ("/ask", lambda rng: ask_payload(rng, "kid"), _answer_ok),
+    "analyze": ("/analyze", analyze_payload, lambda body: "deficiencies" in body),
+    "generate_adaptive_plan": ("/generate-adaptive-plan", plan_payload, _plan_ok),
+}
+
+DEFAULT_MIX = {"ask_parent": 4, "ask_kid": 3, "analyze": 2, "generate_adaptive_plan": 1}
+
+
+def build_jobs(requests: int, mix: Dict[str, int], seed: int) -> List[Tuple[str, bytes]]:
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    jobs = []
+    for _ in range(requests):
+        name = rng.choices(names, weights)[0]
+        _, factory, _ = SCENARIOS[name]
+        jobs.append((name, json.dumps(factory(rng)).encode("utf-8")))
+    return jobs
+
+
+def send(base_url: str, name: str, body: bytes, timeout: float) -> Tuple[str, float, bool]:
+    path, _, check = SCENARIOS[name]
+    request = urllib.request.Request(
+        base_url.rstrip("/") + path, data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            ok = response.status == 200 and check(json.loads(response.read()))
+    except (urllib.error.URLError, OSError, ValueError):
+        ok = False
+    return name, time.perf_counter() - start, ok
+
+
+def run(base_url: str, jobs: List[Tuple[str, bytes]], concurrency: int, timeout: float) -> Dict[str, Dict[str, float]]:
+    latencies: Dict[str, List[float]] = {name: [] for name, _ in jobs}
+    errors: Dict[str, int] = {name: 0 for name, _ in jobs}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for name, elapsed, ok in pool.map(lambda job: send(base_url, job[0], job[1], timeout), jobs):
+            if ok:
+                latencies[name].append(elapsed)
+            else:
+                errors[name] += 1
+    wall = time.perf_counter() - start
+
+    results = {name: summarize(latencies[name], errors[name], wall) for name in sorted(latencies)}
+    results["all"] = summarize(
+        [x for values in latencies.values() for x in values], sum(errors.values()), wall
+    )
+    return results
+
+
+def ask_is_mocked(base_url: str, timeout: float) -> bool:
+    """One probe /ask call: True if the server has no RAG files and only returns the mock answer."""
+    body = json.dumps(ask_payload(random.Random(0), "parent")).encode("utf-8")
+    request = urllib.request.Request(
+        base_url.rstrip("/") + "/ask", data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return str(json.loads(response.read()).get("answer", "")).startswith(MOCK_PREFIX)
+    except (urllib.error.URLError, OSError, ValueError):
+        return False  # connection problems show up as errors in the run itself
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    """"ask_parent=4,analyze=1" -> {"ask_parent": 4, "analyze": 1}"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test /ask, /analyze and /generate-adaptive-plan")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10, help="Requests sent (and discarded) before measuring")
+    parser.add_argument("--mix", help="Scenario weights, e.g. ask_parent=4,ask_kid=3,analyze=2,generate_adaptive_plan=1")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    add_baseline_args(parser)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    if any(SCENARIOS[name][0] == "/ask" for name in mix) and ask_is_mocked(args.url, args.timeout):
+        print("Error: /ask returns the mock response because the server has no RAG files "
+              "(faiss_textbooks.index, rag_docs_textbooks_only.pkl), so ask_* scenarios would measure nothing. "
+              "Add them to nutrikid-backend/ or drop ask_* from --mix.")
+        return 2
+    if args.warmup:
+        run(args.url, build_jobs(args.warmup, mix, args.seed + 1), args.concurrency, args.timeout)
+
+    results = run(args.url, build_jobs(args.requests, mix, args.seed), args.concurrency, args.timeout)
+    print_table(f"Load test: {args.requests} requests, concurrency {args.concurrency} against {args.url}", results)
+    return finish(results, args.baseline, args.tolerance, args.save_baseline, args.error_tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
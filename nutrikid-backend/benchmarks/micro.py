@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.payloads import CONDITIONS, KID_QUESTIONS, PARENT_QUESTIONS, PROFILE, make_rows
+from benchmarks.report import add_baseline_args, finish, print_table, summarize
+from services.nutrition_analysis import calculate_deficiencies
+from services.risk_engine import assess_risk
+
+# In-process micro-benchmarks for the hot helpers behind the endpoints.
+# Run from nutrikid-backend/: python -m benchmarks.micro
+
+
+def time_calls(fn: Callable, inputs: List, iterations: int) -> Dict[str, float]:
+    fn(inputs[0])  # warm up
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        arg = inputs[i % len(inputs)]
+        t = time.perf_counter()
+        fn(arg)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, 0, time.perf_counter() - start)
+
+
+def bench_deficiencies(iterations: int, rng: random.Random) -> Dict[str, float]:
+    logs = [make_rows(rng.randint(14, 30), seed=rng.randint(0, 10**6)) for _ in range(20)]
+    return time_calls(lambda rows: calculate_deficiencies(rows, 7), logs, iterations)
+
+
+def bench_assess_risk(iterations: int, rng: random.Random) -> Dict[str, float]:
+    cases = []
+    for _ in range(50):
+        rows = make_rows(rng.randint(1, 30), seed=rng.randint(0, 10**6))
+        profile = {**PROFILE, "conditions": rng.choice(CONDITIONS), "weight": f"{rng.randint(12, 40)} kg"}
+        notes = rng.choice(["", "", "Mild cough last week", "Was in hospital for dehydration"])
+        cases.append((profile, calculate_deficiencies(rows, profile["age"]), notes))
+    return time_calls(lambda case: assess_risk(*case), cases, iterations)
+
+
+def bench_retrieve_context(iterations: int) -> Dict[str, float]:
+    """Needs the FAISS index, documents and embedder, loaded the same way the server does."""
+    try:
+        import main
+    except ImportError as e:
+        print(f"Skipping retrieve_context: {e}")
+        return {}
+
+    async def run():
+        async with main.lifespan(main.app):
+            if main.index is None or main.embedder is None:
+                print("Skipping retrieve_context: RAG index or embedder not loaded.")
+                return {}
+            # retrieve_context prints the retrieved indices on every call
+            with contextlib.redirect_stdout(io.StringIO()):
+                return time_calls(main.retrieve_context, PARENT_QUESTIONS + KID_QUESTIONS, iterations)
+
+    return asyncio.run(run())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks: retrieve_context, calculate_deficiencies, assess_risk")
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--retrieve-iterations", type=int, default=100)
+    parser.add_argument("--skip-retrieve", action="store_true", help="Don't load the embedder / FAISS index")
+    parser.add_argument("--seed", type=int, default=7)
+    add_baseline_args(parser)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = {
+        "calculate_deficiencies": bench_deficiencies(args.iterations, rng),
+        "assess_risk": bench_assess_risk(args.iterations, rng),
+    }
+    if not args.skip_retrieve:
+        retrieve = bench_retrieve_context(args.retrieve_iterations)
+        if retrieve:
+            results["retrieve_context"] = retrieve
+
+    print_table("Micro-benchmarks (per call)", results)
+    return finish(results, args.baseline, args.tolerance, args.save_baseline, args.error_tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
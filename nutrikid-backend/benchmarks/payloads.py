@@ -0,0 +1,86 @@
+import random
+
+# Realistic request bodies shared by the load generator and the micro-benchmarks
+
+FOODS = [
+    "Idli with sambar", "Poha", "Dal rice", "Palak paneer with roti", "Curd rice",
+    "Egg bhurji", "Ragi dosa", "Chicken curry", "Upma", "Banana", "Orange", "Milk",
+    "Vegetable pulao", "Sprouts chaat", "Biscuits", "Chapati with aloo sabzi"
+]
+MEAL_TYPES = ["Breakfast", "Lunch", "Snack", "Dinner"]
+PROFILE = {"age": 7, "weight": "22 kg", "gender": "female", "conditions": [], "preferences": ["veg"]}
+
+PARENT_QUESTIONS = [
+    "My 6 year old refuses vegetables, how can I add more iron to her diet?",
+    "Is it okay to give my son milk with every meal?",
+    "What should a 5 year old eat for breakfast before school?",
+    "My daughter has had a stomach ache since yesterday, what should she eat?",
+    "How much water should a 7 year old drink in summer?",
+]
+KID_QUESTIONS = [
+    "Why should I eat carrots?",
+    "Tell me a veggie story!",
+    "Is chocolate bad for me?",
+    "What food makes me strong like a superhero?",
+    "Why does milk help my bones?",
+]
+CONDITIONS = [[], [], [], ["mild asthma"], ["lactose intolerance"], ["celiac disease"]]
+
+
+def make_rows(days: int, seed: int = 42):
+    rng = random.Random(seed)
+    rows = []
+    for day in range(days):
+        for meal_type in MEAL_TYPES:
+            rows.append({
+                "name": rng.choice(FOODS),
+                "portion": "1 serving",
+                "date": f"2026-09-{day % 30 + 1:02d}",
+                "meal_type": meal_type,
+            })
+    return rows
+
+
+def to_columns(rows):
+    return {
+        "names": [r["name"] for r in rows],
+        "portions": [r["portion"] for r in rows],
+        "dates": [r["date"] for r in rows],
+        "meal_types": [r["meal_type"] for r in rows],
+    }
+
+
+def ask_payload(rng: random.Random, audience: str) -> dict:
+    questions = KID_QUESTIONS if audience == "kid" else PARENT_QUESTIONS
+    return {
+        "question": rng.choice(questions),
+        "history": [],
+        "age": f"{rng.randint(3, 12)} years",
+        "weight": f"{rng.randint(14, 40)} kg",
+        "conditions": "None",
+        "prescription": "None",
+        "audience": audience,
+    }
+
+
+def analyze_payload(rng: random.Random) -> dict:
+    return {
+        "age": rng.randint(3, 12),
+        "gender": rng.choice(["male", "female"]),
+        "meals": [{"name": rng.choice(FOODS), "portion": "1 serving"} for _ in range(rng.randint(3, 6))],
+    }
+
+
+def plan_payload(rng: random.Random) -> dict:
+    age = rng.randint(3, 12)
+    return {
+        "child_profile": {
+            **PROFILE,
+            "age": age,
+            "weight": f"{age * 2 + rng.randint(6, 14)} kg",
+            "conditions": rng.choice(CONDITIONS),
+        },
+        "meal_logs": make_rows(rng.randint(14, 30), seed=rng.randint(0, 10**6)),
+        "duration_days": 7,
+        "doctor_notes": "",
+    }
@@ -0,0 +1,96 @@
+import json
+import math
+import os
+from typing import Dict, List
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies_s: List[float], errors: int, wall_s: float) -> Dict[str, float]:
+    values = sorted(latencies_s)
+    total = len(values) + errors
+    return {
+        "count": total,
+        "errors": errors,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "throughput_per_s": round(len(values) / wall_s, 2) if wall_s > 0 else 0.0,
+    }
+
+
+def print_table(title: str, results: Dict[str, Dict[str, float]]):
+    print(f"\n{title}")
+    print(f"{'scenario':<28} {'count':>7} {'errors':>7} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'per s':>10}")
+    for name, r in results.items():
+        print(f"{name:<28} {r['count']:>7} {r['errors']:>7} {r['p50_ms']:>10.3f} "
+              f"{r['p95_ms']:>10.3f} {r['p99_ms']:>10.3f} {r['throughput_per_s']:>10.2f}")
+
+
+def save_baseline(results: Dict[str, Dict[str, float]], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Baseline saved to {path}")
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, float]], path: str, tolerance: float,
+                        error_tolerance: float = 0.01) -> List[str]:
+    """
+    Lists regressions against a stored baseline: p95 slower or throughput lower by
+    more than `tolerance` (0.2 = 20%), or error rate higher by more than
+    `error_tolerance` percentage points (0.01 = 1 point).
+    """
+    if not os.path.exists(path):
+        print(f"No baseline at {path}; nothing to compare.")
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base["p95_ms"] > 0 and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']:.3f}ms vs baseline {base['p95_ms']:.3f}ms")
+        if base["throughput_per_s"] > 0 and current["throughput_per_s"] < base["throughput_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {current['throughput_per_s']:.2f}/s vs baseline {base['throughput_per_s']:.2f}/s"
+            )
+        base_error_rate = base["errors"] / base["count"] if base["count"] else 0.0
+        error_rate = current["errors"] / current["count"] if current["count"] else 0.0
+        if error_rate > base_error_rate + error_tolerance:
+            regressions.append(f"{name}: error rate {error_rate:.1%} vs baseline {base_error_rate:.1%}")
+    return regressions
+
+
+def finish(results: Dict[str, Dict[str, float]], baseline: str, tolerance: float, save: bool,
+           error_tolerance: float = 0.01) -> int:
+    """Shared tail of every benchmark: save or compare the baseline and return an exit code."""
+    if not baseline:
+        return 0
+    if save:
+        save_baseline(results, baseline)
+        return 0
+    regressions = compare_to_baseline(results, baseline, tolerance, error_tolerance)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print(f"\nNo regressions against {baseline} (tolerance {tolerance:.0%}, error tolerance {error_tolerance:.1%}).")
+    return 0
+
+
+def add_baseline_args(parser):
+    parser.add_argument("--baseline", help="Baseline JSON to compare against (or write with --save-baseline)")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run's results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95/throughput regression before failing (0.2 = 20%%)")
+    parser.add_argument("--error-tolerance", type=float, default=0.01,
+                        help="Allowed rise in error rate, in absolute terms (0.01 = 1 percentage point)")
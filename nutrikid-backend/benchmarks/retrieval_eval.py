@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import pickle
+import re
+import sys
+import time
+from typing import Dict, List, Set, Tuple
+
+import faiss
+import numpy as np
+
+from benchmarks.report import percentile
+from main import EMBEDDER_MODELS, document_text
+
+# Offline retrieval quality + latency evaluation for retrieve_context.
+# For each embedder x index configuration: recall@k, MRR, per-query embed/search latency
+# and memory, written as a markdown comparison table.
+# Run from nutrikid-backend/: python -m benchmarks.retrieval_eval --embedders minilm,bge-large
+
+EMBEDDERS = {"minilm": EMBEDDER_MODELS[384], "bge-large": EMBEDDER_MODELS[1024]}
+INDEX_TYPES = ("flat", "flat-ip", "hnsw", "ivf")
+
+
+def load_queries(path: str, texts: List[str]) -> List[Tuple[str, Set[int]]]:
+    """
+    Each entry has a "query" plus "relevant_ids" (document positions in the pickle) and/or
+    "relevant_contains" (phrases; any document containing one, case-insensitively, is relevant).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    lowered = [t.lower() for t in texts]
+    queries = []
+    for item in items:
+        relevant = set(item.get("relevant_ids", []))
+        for phrase in item.get("relevant_contains", []):
+            phrase = phrase.lower()
+            relevant.update(i for i, text in enumerate(lowered) if phrase in text)
+        if not relevant:
+            print(f"Warning: no relevant documents for query '{item['query']}', skipping.")
+            continue
+        queries.append((item["query"], relevant))
+    return queries
+
+
+def corpus_embeddings(model, model_name: str, texts: List[str], cache_dir: str) -> np.ndarray:
+    """Embeds the corpus the way rebuild_index.py does, caching the result per model."""
+    cache_path = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_path = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name) + f"_{len(texts)}.npy")
+        if os.path.exists(cache_path):
+            print(f"Using cached embeddings {cache_path}")
+            return np.load(cache_path)
+
+    print(f"Embedding {len(texts)} documents with {model_name} (this takes a while)...")
+    embeddings = np.array(model.encode(texts, show_progress_bar=True, normalize_embeddings=True)).astype("float32")
+    if cache_path:
+        np.save(cache_path, embeddings)
+    return embeddings
+
+
+def build_index(kind: str, embeddings: np.ndarray):
+    dimension = embeddings.shape[1]
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dimension)  # what rebuild_index.py / production uses
+    elif kind == "flat-ip":
+        index = faiss.IndexFlatIP(dimension)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, 32)
+        index.hnsw.efSearch = 64
+    elif kind == "ivf":
+        nlist = max(1, int(np.sqrt(len(embeddings))))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, nlist)
+        index.train(embeddings)
+        index.nprobe = max(1, nlist // 8)
+    else:
+        raise ValueError(f"Unknown index type '{kind}'. Choose from: {', '.join(INDEX_TYPES)}")
+    index.add(embeddings)
+    return index
+
+
+def model_bytes(model) -> int:
+    try:
+        return sum(p.numel() * p.element_size() for p in model.parameters())
+    except AttributeError:
+        return 0
+
+
+def evaluate(encode, index, queries: List[Tuple[str, Set[int]]], ks: List[int], normalize: bool) -> Dict[str, float]:
+    """Runs every query through encode + search exactly once, as retrieve_context does."""
+    max_k = max(ks)
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks = []
+    embed_times, search_times = [], []
+
+    for query, relevant in queries:
+        start = time.perf_counter()
+        vector = np.array(encode([query])).astype("float32")
+        embed_times.append(time.perf_counter() - start)
+        if normalize:
+            faiss.normalize_L2(vector)
+
+        start = time.perf_counter()
+        _, indices = index.search(vector, max_k)
+        search_times.append(time.perf_counter() - start)
+
+        ranked = [int(i) for i in indices[0] if i >= 0]
+        for k in ks:
+            hits = len(relevant.intersection(ranked[:k]))
+            recalls[k].append(hits / min(k, len(relevant)))
+        rank = next((pos for pos, doc_id in enumerate(ranked, 1) if doc_id in relevant), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    embed_times.sort()
+    search_times.sort()
+    metrics = {f"recall@{k}": float(np.mean(values)) for k, values in recalls.items()}
+    metrics.update(
+        mrr=float(np.mean(reciprocal_ranks)),
+        embed_p50_ms=percentile(embed_times, 50) * 1000,
+        embed_p95_ms=percentile(embed_times, 95) * 1000,
+        search_p50_ms=percentile(search_times, 50) * 1000,
+        search_p95_ms=percentile(search_times, 95) * 1000,
+    )
+    return metrics
+
+
+def markdown_table(rows: List[Dict], ks: List[int]) -> str:
+    columns = (["embedder", "index", "dim"] + [f"recall@{k}" for k in ks] +
+               ["mrr", "embed_p50_ms", "embed_p95_ms", "search_p50_ms", "search_p95_ms",
+                "index_mb", "model_mb", "build_s"])
+    lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    for row in rows:
+        cells = []
+        for col in columns:
+            value = row.get(col, "")
+            cells.append(f"{value:.3f}" if isinstance(value, float) else str(value))
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Retrieval quality/latency evaluation for retrieve_context")
+    parser.add_argument("--docs", default="rag_docs_textbooks_only.pkl")
+    parser.add_argument("--queries", default=os.path.join("benchmarks", "retrieval_queries.json"))
+    parser.add_argument("--embedders", default="minilm", help=f"Comma list of {', '.join(EMBEDDERS)} or model IDs")
+    parser.add_argument("--index-types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--existing-index", help="Also evaluate a saved index (e.g. faiss_textbooks.index) as-is")
+    parser.add_argument("--k", default="1,4,10", help="Cutoffs for recall@k (retrieve_context uses k=4)")
+    parser.add_argument("--cache-dir", default=os.path.join("benchmarks", ".cache"))
+    parser.add_argument("--output", default=os.path.join("benchmarks", "retrieval_report.md"))
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    with open(args.docs, "rb") as f:
+        texts = [document_text(doc) for doc in pickle.load(f)]
+    ks = sorted(int(k) for k in args.k.split(","))
+    queries = load_queries(args.queries, texts)
+    print(f"Loaded {len(texts)} documents and {len(queries)} labelled queries.")
+
+    rows = []
+    models = {}
+    for name in args.embedders.split(","):
+        model_name = EMBEDDERS.get(name, name)
+        print(f"\nLoading embedder {model_name}...")
+        model = models[model_name] = SentenceTransformer(model_name)
+        embeddings = corpus_embeddings(model, model_name, texts, args.cache_dir)
+
+        for kind in args.index_types.split(","):
+            start = time.perf_counter()
+            index = build_index(kind, embeddings)
+            build_s = time.perf_counter() - start
+            metrics = evaluate(model.encode, index, queries, ks, normalize=(kind == "flat-ip"))
+            rows.append({
+                "embedder": name, "index": kind, "dim": embeddings.shape[1], **metrics,
+                "index_mb": len(faiss.serialize_index(index)) / 2**20,
+                "model_mb": model_bytes(model) / 2**20,
+                "build_s": build_s,
+            })
+            print(f"{name}/{kind}: recall@{ks[-1]}={metrics[f'recall@{ks[-1]}']:.3f} mrr={metrics['mrr']:.3f}")
+
+    if args.existing_index:
+        index = faiss.read_index(args.existing_index)
+        model_name = EMBEDDER_MODELS.get(index.d, EMBEDDER_MODELS[384])
+        model = models.get(model_name) or SentenceTransformer(model_name)
+        metrics = evaluate(model.encode, index, queries, ks, normalize=False)
+        rows.append({
+            "embedder": model_name.split("/")[-1], "index": os.path.basename(args.existing_index), "dim": index.d,
+            **metrics,
+            "index_mb": len(faiss.serialize_index(index)) / 2**20,
+            "model_mb": model_bytes(model) / 2**20,
+        })
+
+    table = markdown_table(rows, ks)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(f"# Retrieval evaluation\n\n{len(texts)} documents, {len(queries)} queries from `{args.queries}`.\n\n")
+        f.write(table + "\n")
+    print("\n" + table)
+    print(f"\nReport written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import os
+
+import main
+from services.kid_faq import AGE_BANDS, KID_FAQ_PATH, write_bank
+
+QUESTIONS_PATH = "kid_faq_questions.json"
+DRAFTS_PATH = "kid_faq_drafts.json"
+
+# Age used when generating each band's answer
+BAND_AGES = {"3-5": "4 years", "6-8": "7 years", "9-12": "10 years"}
+
+
+def load_drafts():
+    if not os.path.exists(DRAFTS_PATH):
+        return {}
+    with open(DRAFTS_PATH, "r", encoding="utf-8") as f:
+        return {(d["faq_id"], d["band"]): d for d in json.load(f)}
+
+
+def save_drafts(drafts):
+    with open(DRAFTS_PATH, "w", encoding="utf-8") as f:
+        json.dump(sorted(drafts.values(), key=lambda d: (d["faq_id"], d["band"])), f, indent=2, ensure_ascii=False)
+
+
+def generate(force: bool):
+    """Step 1: draft an answer per question and age band through the live Food Buddy path."""
+    with open(QUESTIONS_PATH, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    drafts = load_drafts()
+
+    created = 0
+    for item in spec["questions"]:
+        for band in spec.get("bands", list(AGE_BANDS)):
+            key = (item["id"], band)
+            existing = drafts.get(key)
+            if existing and existing.get("approved") and not force:
+                # Keep reviewed wording; only refresh the phrasings
+                existing["question"], existing["paraphrases"] = item["question"], item.get("paraphrases", [])
+                continue
+
+            profile = {"age": BAND_AGES[band], "weight": "Unknown", "conditions": "None",
+                       "prescription": "None", "audience": "kid"}
+            answer = main.generate_answer(item["question"], [], profile)
+            if answer.startswith("Error") or answer.startswith("(Mock Response)"):
+                print(f"Skipping {item['id']} [{band}]: {answer[:80]}")
+                continue
+
+            drafts[key] = {
+                "faq_id": item["id"],
+                "band": band,
+                "question": item["question"],
+                "paraphrases": item.get("paraphrases", []),
+                "answer": answer.strip(),
+                "approved": False,
+            }
+            created += 1
+            print(f"Drafted {item['id']} [{band}]")
+
+    save_drafts(drafts)
+    print(f"{created} new drafts written to {DRAFTS_PATH}.")
+    print("Review them (edit 'answer', set 'approved': true), then run: python build_kid_faq.py publish")
+
+
+def publish():
+    """Step 2: compile approved drafts into the disk-backed store the server reads."""
+    approved = [d for d in load_drafts().values() if d.get("approved")]
+    if not approved:
+        print(f"No approved drafts in {DRAFTS_PATH}. Nothing to publish.")
+        return
+    if main.embedder is None:
+        print("Error: embedding model not loaded.")
+        return
+
+    entries = [{
+        "faq_id": d["faq_id"],
+        "band": d["band"],
+        "questions": [d["question"]] + d.get("paraphrases", []),
+        "answer": d["answer"],
+    } for d in approved]
+    write_bank(KID_FAQ_PATH, entries, main.embedder, main.embedder_name)
+    print(f"Published {len(entries)} answers to {KID_FAQ_PATH} (embedder: {main.embedder_name}).")
+    print("Restart the server to pick up the new answers.")
+
+
+async def run(args):
+    # Same startup as the server: RAG index, matching embedder and LLM clients
+    async with main.lifespan(main.app):
+        if args.command == "generate":
+            generate(args.force)
+        else:
+            publish()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Food Buddy kid FAQ answer bank")
+    parser.add_argument("command", choices=["generate", "publish"])
+    parser.add_argument("--force", action="store_true", help="Regenerate drafts even if already approved")
+    asyncio.run(run(parser.parse_args()))
@@ -2,25 +2,49 @@ import faiss
 import pickle
 import numpy as np
 import os
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from sentence_transformers import SentenceTransformer
 from huggingface_hub import InferenceClient
+from models import NutrientGap, NutritionAnalysis
+from services.structured_output import extract_json
+from services.single_flight import single_flight
+from services.kid_faq import KID_FAQ_PATH, KidFaqBank
+from services.prompts import ANALYSIS_PROMPT, KID_PROMPT, PARENT_PROMPT, PLAN_PROMPT, get_prompt_stats
+from services.llm_providers import LLM_ROUTES, create_local_provider, parse_routes
 
 # Global variables for models and data
 embedder = None
+embedder_name = None
 index = None
 documents = None
 hf_client = None
 gemini_client = None
+kid_faq = None
+local_llm = None
+
+# Which endpoints (prompt names) use the local backend instead of the hosted HF model
+llm_routes = parse_routes(LLM_ROUTES)
+
+def get_llm(route):
+    if llm_routes.get(route) == "local" and local_llm is not None:
+        return local_llm
+    return hf_client
+
+# Embedding model per FAISS index dimension
+EMBEDDER_MODELS = {
+    384: "sentence-transformers/all-MiniLM-L6-v2",
+    1024: "BAAI/bge-large-en-v1.5",
+}
 
 # =============================
 # Lifespan Manager
 # =============================
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global embedder, index, documents, hf_client, gemini_client
+    global embedder, embedder_name, index, documents, hf_client, gemini_client, kid_faq, local_llm
     
     # 1. Load FAISS Index + Docs (First, to check dimension)
     index_dim = 384 # Default to small model dimension
@@ -50,17 +74,22 @@ async def lifespan(app: FastAPI):
     try:
         if index_dim == 384:
             # Small model
-            embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+            embedder = SentenceTransformer(EMBEDDER_MODELS[384])
         elif index_dim == 1024:
             # Large model (warning: slow download)
-            print("Required model: BAAI/bge-large-en-v1.5 (1.34GB)")
-            embedder = SentenceTransformer("BAAI/bge-large-en-v1.5")
+            print(f"Required model: {EMBEDDER_MODELS[1024]} (1.34GB)")
+            embedder = SentenceTransformer(EMBEDDER_MODELS[1024])
         else:
             print(f"Warning: Unknown index dimension {index_dim}. Defaulting to all-MiniLM-L6-v2.")
-            embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+            embedder = SentenceTransformer(EMBEDDER_MODELS[384])
             
     except Exception as e:
         print(f"Warning: Failed to load embedding model: {e}")
+    embedder_name = EMBEDDER_MODELS.get(index_dim, EMBEDDER_MODELS[384])
+
+    # Pre-reviewed Food Buddy answers (see build_kid_faq.py)
+    if embedder is not None:
+        kid_faq = KidFaqBank.load(KID_FAQ_PATH, embedder_name)
 
     # Load environment variables
     from dotenv import load_dotenv
@@ -71,23 +100,41 @@ async def lifespan(app: FastAPI):
     if not hf_token:
         print("Warning: HF_TOKEN environment variable not set. HF LLM features may not work.")
     
-    hf_client = InferenceClient(
-        model="HuggingFaceH4/zephyr-7b-beta",
-        token=hf_token
-    )
+    # HF_BASE_URL points the client at a self-hosted/OpenAI-compatible server (e.g. benchmarks/fake_llm.py)
+    hf_base_url = os.getenv("HF_BASE_URL")
+    if hf_base_url:
+        print(f"Using HF-compatible endpoint at {hf_base_url}")
+        hf_client = InferenceClient(base_url=hf_base_url, token=hf_token)
+    else:
+        hf_client = InferenceClient(
+            model="HuggingFaceH4/zephyr-7b-beta",
+            token=hf_token
+        )
 
     # Initialize Gemini LLM Client Pipeline 
     gemini_api_key = os.getenv("GEMINI_API_KEY")
     if gemini_api_key:
         try:
             from google import genai
-            gemini_client = genai.Client(api_key=gemini_api_key)
+            gemini_base_url = os.getenv("GEMINI_BASE_URL")
+            if gemini_base_url:
+                print(f"Using Gemini-compatible endpoint at {gemini_base_url}")
+                gemini_client = genai.Client(api_key=gemini_api_key, http_options={"base_url": gemini_base_url})
+            else:
+                gemini_client = genai.Client(api_key=gemini_api_key)
             print("Gemini API Client initialized successfully.")
         except ImportError:
             print("google-genai library is not installed. Gemini fallback will be unavailable.")
     else:
         print("Warning: GEMINI_API_KEY environment variable not set. Gemini fallback will not be available.")
 
+    # Local inference backend for endpoints routed to it (LLM_ROUTES)
+    if "local" in llm_routes.values():
+        local_llm = create_local_provider()
+
+    # Compile risk rules up front (they hot-reload when the file changes)
+    get_rule_set()
+
     yield
     
     # Clean up resources if needed
@@ -130,11 +177,25 @@ class NutritionAnalysisRequest(BaseModel):
     meals: list[MealLog]
 
 
-def retrieve_context(query, k=4):
+def document_text(doc):
+    # Handle if doc is a dictionary (common in LangChain/RAG)
+    if isinstance(doc, dict):
+        # Try common keys for text content
+        return doc.get('page_content') or doc.get('text') or doc.get('content') or str(doc)
+    # Handle if doc is an object (e.g. LangChain Document)
+    if hasattr(doc, 'page_content'):
+        return doc.page_content
+    # Handle if doc is already a string
+    if isinstance(doc, str):
+        return doc
+    return str(doc)
+
+def retrieve_context(query, k=4, query_embedding=None):
     if index is None or documents is None or embedder is None:
         return "No context available (Index/Documents not loaded)."
         
-    query_embedding = embedder.encode([query])
+    if query_embedding is None:
+        query_embedding = embedder.encode([query])
     distances, indices = index.search(np.array(query_embedding), k)
     
     # Retrieve documents based on indices
@@ -142,100 +203,51 @@ def retrieve_context(query, k=4):
     print(f"Retrieved indices: {indices[0]}") # Debugging
     
     for i in indices[0]:
-        doc = documents[i]
-        # Handle if doc is a dictionary (common in LangChain/RAG)
-        if isinstance(doc, dict):
-            # Try common keys for text content
-            content = doc.get('page_content') or doc.get('text') or doc.get('content') or str(doc)
-            retrieved_docs.append(content)
-        # Handle if doc is an object (e.g. LangChain Document)
-        elif hasattr(doc, 'page_content'):
-             retrieved_docs.append(doc.page_content)
-        # Handle if doc is already a string
-        elif isinstance(doc, str):
-            retrieved_docs.append(doc)
-        else:
-            retrieved_docs.append(str(doc))
+        retrieved_docs.append(document_text(documents[i]))
 
     return "\n".join(retrieved_docs)
 
-def generate_answer(query, history, profile):
-    context = retrieve_context(query)
+def answer_question(query, history, profile):
+    # Kid FAQs ("why eat carrots") come from the reviewed answer bank; everything else goes live
+    query_embedding = None
+    if profile.get("audience") == "kid" and kid_faq is not None:
+        query_embedding = embedder.encode([query])
+        answer = kid_faq.lookup(query_embedding, profile["age"])
+        if answer:
+            return answer
+    return generate_answer(query, history, profile, query_embedding)
+
+def generate_answer(query, history, profile, query_embedding=None):
+    context = retrieve_context(query, query_embedding=query_embedding)
 
     # If running in mock mode because files are missing
     if index is None or documents is None:
         return ("(Mock Response) System is running in safe mode because RAG files are missing. "
                 "Please place 'faiss_textbooks.index' and 'rag_docs_textbooks_only.pkl' in the project folder.")
 
-    if profile.get("audience") == "kid":
-         prompt = f"""
-You are Food Buddy, a fun and friendly nutrition companion for kids! 🥦🦁
-
-RULES:
-- Start with a fun greeting!
-- Use a storyteller voice.
-- If asked for a story, make up a short, fun adventure about food heroes!
-- Use simple words and lots of emojis.
-- Explain things using superheroes (e.g., "Carrots give you X-ray vision like a hero!").
-- Do NOT give medical advice.
-- If asked about medicine, say "Ask a grown-up!".
-- Structure your answer nicely using bullet points and short paragraphs.
-
-Information about the kid:
-Age: {profile["age"]}
-
-Question: {query}
-
-Context:
-{context}
-
-Answer like a best friend:
-"""
-    else:
-        prompt = f"""
-You are NutriGuide AI, an advanced pediatric nutrition assistant.
-
-STRICT INSTRUCTIONS:
-1. If the user's question involves a symptom (e.g., fever, stomach ache) and lacks crucial context (e.g., how many days they've had it, severity, other symptoms), you MUST ask 1-2 brief follow-up questions to gather more information BEFORE giving a detailed answer.
-2. If you have enough context, first provide a **Direct, Short Answer** (2-3 sentences max) with practical and immediate advice.
-3. Then, output exactly this separator: |||DETAILED|||
-4. After the separator, provide a **Detailed Explanation**. Use Markdown formatting (### for headers, - for bullets, **bold** for key terms). Explain *why* and give specific examples.
-5. Do NOT output |||DETAILED||| if you are just asking a clarifying question.
-
-Profile:
-Age: {profile["age"]}
-Weight: {profile["weight"]}
-Conditions: {profile["conditions"]}
-Prescriptions: {profile["prescription"]}
-
-Context:
-{context}
-
-Format if answering:
-[Short Answer]
-|||DETAILED|||
-[Detailed Markdown Explanation]
-
-Format if asking clarifying question:
-[Just ask the question naturally and empathetically]
-"""
+    # Fixed instruction block as the system message, so every call for the endpoint shares
+    # that prefix; then history; then profile, context and question in the last user message.
+    # History and context are trimmed to the endpoint's token budget if needed.
+    template = KID_PROMPT if profile.get("audience") == "kid" else PARENT_PROMPT
+    rendered = template.render({**profile, "question": query, "context": context}, history)
+    history = rendered.history
+    llm = get_llm(template.name)
 
     # Build messages array including history
-    formatted_messages = []
+    formatted_messages = [{"role": "system", "content": template.instructions}]
     for msg in history:
         # Convert "model" to "assistant" for HF, or keep as is.
         # Gemini uses 'user' and 'model'. HF uses 'user' and 'assistant'.
         hf_role = "assistant" if msg.role == "model" or msg.role == "assistant" else "user"
         formatted_messages.append({"role": hf_role, "content": msg.content})
     
-    # Add the final system prompt + query
-    # We pass the system context as part of the new user prompt since some APIs don't strictly support system roles
-    final_query = f"{prompt}\n\nQuestion: {query}"
+    # Add the per-request sections + query
+    final_query = rendered.body
     formatted_messages.append({"role": "user", "content": final_query})
 
     try:
-        if hf_client:
-            response = hf_client.chat_completion(
+        if llm:
+            response = llm.chat_completion(
                 messages=formatted_messages,
                 max_tokens=600,
                 temperature=0.3
@@ -260,6 +272,7 @@ Format if asking clarifying question:
                 response = gemini_client.models.generate_content(
                     model='gemini-2.5-flash',
                     contents=gemini_contents,
+                    config={"system_instruction": template.instructions},
                 )
                 return response.text
             except Exception as gemini_e:
@@ -278,49 +291,31 @@ async def ask_ai(request: QueryRequest):
         "audience": request.audience
     }
 
-    answer = generate_answer(request.question, request.history, profile)
+    # Identical in-flight questions share one embedding + retrieval + LLM call
+    answer = await single_flight.do(
+        "ask",
+        request.dict(),
+        lambda: asyncio.to_thread(answer_question, request.question, request.history, profile)
+    )
 
     return {"answer": answer}
 
 @app.post("/analyze")
 async def analyze_nutrition(request: NutritionAnalysisRequest):
+    return await single_flight.do("analyze", request.dict(), lambda: asyncio.to_thread(run_nutrition_analysis, request))
+
+def run_nutrition_analysis(request: NutritionAnalysisRequest):
     # 1. Construct prompt for LLM to analyze nutrition
     meal_descriptions = ", ".join([f"{m.name} ({m.portion})" for m in request.meals])
-    
-    prompt = f"""
-You are a Clinical Pediatric Nutritionist AI. 
-Explain the micronutrient gaps based on the child's intake today vs Recommended Dietary Allowance (RDA) for a {request.age} year old.
-
-Intake Today: {meal_descriptions}
-
-Task:
-1. Estimate the micronutrient content (Iron, Calcium, Vit A, Vit C, Vit D, Zinc, Magnesium).
-2. Compare against RDA for age {request.age}.
-3. Identify SUBSTANTIAL deficiencies (Gaps).
-4. For each gap, suggest 1 specific food to add.
-
-Format the output strictly as JSON:
-```json
-{{
-  "analysis_summary": "Short clinical summary (max 2 sentences).",
-  "deficiencies": [
-    {{
-      "nutrient": "Iron",
-      "status": "Low" | "Very Low",
-      "current_estimated": "3mg",
-      "target": "10mg",
-      "suggestion": "Add spinach or lentils"
-    }}
-  ],
-  "score": 85
-}}
-```
-Do not include any text outside the JSON block.
-"""
+    rendered = ANALYSIS_PROMPT.render({"age": request.age, "meals": meal_descriptions})
+    prompt = rendered.text
+    # The model only saw part of the meal list; say so instead of presenting it as the whole day
+    intake_truncated = "intake" in rendered.trimmed
+    llm = get_llm(ANALYSIS_PROMPT.name)
 
     try:
-        if hf_client:
-             response = hf_client.chat_completion(
+        if llm:
+             response = llm.chat_completion(
                  messages=[{"role": "user", "content": prompt}],
                  max_tokens=600,
                  temperature=0.2
@@ -345,23 +340,47 @@ Do not include any text outside the JSON block.
              print("No Gemini Client available. Using rule-based fallback...")
              return perform_rule_based_analysis(request.meals, request.age)
 
-    # Extract JSON from potential markdown code blocks
-    import json
-    import re
-    
-    json_match = re.search(r'```json\n(.*?)\n```', content, re.DOTALL)
-    if json_match:
-        json_str = json_match.group(1)
-    else:
-        # Try to find just braces if no code block
-        json_match = re.search(r'\{.*\}', content, re.DOTALL)
-        json_str = json_match.group(0) if json_match else "{}"
-        
+    # Extract JSON (code fences, stray braces and truncation handled by the scanner)
+    result = extract_json(content, NutritionAnalysis)
+    if result.ok:
+        return _mark_intake(result.data, intake_truncated)
+    if not result.data:
+        print(f"Failed to decode JSON from model output ({result.error}). Falling back...")
+        return perform_rule_based_analysis(request.meals, request.age)
+
+    # Keep what the model got right: drop only the deficiency entries that don't validate,
+    # and score the remaining list the way the rule-based analysis does if the score is missing
+    print(f"Model analysis incomplete (repaired={result.repaired}). Failed fields: {result.failed_fields}")
+    analysis = dict(result.data)
+    if not isinstance(analysis.get("deficiencies"), list):
+        print("Model analysis has no deficiency list. Falling back...")
+        return perform_rule_based_analysis(request.meals, request.age)
+    analysis["deficiencies"] = [d for d in analysis["deficiencies"] if _valid_gap(d)]
+    if "score" in {f.split(".")[0] for f in result.failed_fields}:
+        analysis["score"] = gap_score(analysis["deficiencies"])
     try:
-        return json.loads(json_str)
-    except json.JSONDecodeError:
-        print(f"Failed to decode JSON from model output. Falling back...")
+        NutritionAnalysis(**analysis)
+    except ValidationError as e:
+        print(f"Model analysis still invalid ({e.error_count()} errors). Falling back...")
         return perform_rule_based_analysis(request.meals, request.age)
+    return _mark_intake(analysis, intake_truncated)
+
+def _mark_intake(analysis, intake_truncated):
+    analysis["intake_truncated"] = intake_truncated
+    if intake_truncated:
+        analysis["analysis_note"] = "The meal list was too long for the AI prompt; only the first part of the day was analysed."
+    return analysis
+
+def _valid_gap(item):
+    try:
+        NutrientGap(**item)
+        return True
+    except (TypeError, ValidationError):
+        return False
+
+def gap_score(gaps):
+    """Rule-based score: 15 points off per gap, never below 40."""
+    return max(100 - len(gaps) * 15, 40)
 
 def perform_rule_based_analysis(meals, age):
     """Fallback analysis when LLM is unavailable."""
@@ -408,29 +427,39 @@ def perform_rule_based_analysis(meals, age):
             "suggestion": "Add lentils/dal or eggs"
         })
 
-    score = 100 - (len(gaps) * 15)
     summary = "Basic analysis based on food groups (AI unavailable)." if gaps else "Diet looks balanced based on food groups."
 
     return {
         "analysis_summary": summary,
         "deficiencies": gaps,
-        "score": max(score, 40)
+        "score": gap_score(gaps)
     }
 
 
 
-from services.nutrition_analysis import calculate_deficiencies, analyze_trends
+from services.nutrition_analysis import calculate_deficiencies_from_names, analyze_trends_from_dates
 from services.risk_engine import assess_risk
+from services.risk_rules import get_rule_set, get_rule_stats
 from services.plan_generator import generate_diet_plan
 from models import DietPlanRequest, DietPlanResponse
+from fastapi import Request
 
 @app.post("/generate-adaptive-plan", response_model=DietPlanResponse)
 async def generate_adaptive_plan(request: DietPlanRequest):
+    return await single_flight.do("generate-adaptive-plan", request.dict(), lambda: run_adaptive_plan(request))
+
+async def run_adaptive_plan(request: DietPlanRequest):
     print(f"Received localized plan request for child age: {request.child_profile.age}")
     
     # 1. PRE-ANALYSIS PHASE
-    deficiencies = calculate_deficiencies([m.dict() for m in request.meal_logs], request.child_profile.age)
-    trend = analyze_trends([m.dict() for m in request.meal_logs])
+    # Analysis only needs the name/date columns; columnar requests already carry them as arrays
+    if request.meal_columns is not None:
+        names, dates = request.meal_columns.names, request.meal_columns.dates
+    else:
+        names = [m.name for m in request.meal_logs]
+        dates = [m.date for m in request.meal_logs]
+    deficiencies = calculate_deficiencies_from_names(names, request.child_profile.age)
+    trend = analyze_trends_from_dates(dates)
     
     # 2. RISK CHECK
     risk_assessment = assess_risk(
@@ -449,13 +478,14 @@ async def generate_adaptive_plan(request: DietPlanRequest):
             risk_level=risk_assessment.risk_level,
             doctor_summary={
                 "risk_flags": risk_assessment.flags,
+                "rule_ids": [f.rule_id for f in risk_assessment.rule_flags],
                 "recommendation": "Manual Clinical Review Required"
             }
         )
 
     # 3. PERSONALIZED PLAN GENERATION
     diet_plan = await generate_diet_plan(
-        hf_client,
+        get_llm(PLAN_PROMPT.name),
         gemini_client,
         request.child_profile.dict(),
         deficiencies,
@@ -466,6 +496,51 @@ async def generate_adaptive_plan(request: DietPlanRequest):
     
     return diet_plan
 
+@app.post("/generate-adaptive-plan/msgpack", response_model=DietPlanResponse)
+async def generate_adaptive_plan_msgpack(request: Request):
+    """Same as /generate-adaptive-plan, for bodies sent as application/msgpack (usually with meal_columns)."""
+    try:
+        import msgpack
+    except ImportError:
+        raise HTTPException(status_code=415, detail="msgpack is not installed on this server (optional: pip install msgpack). Send JSON instead.")
+
+    try:
+        payload = msgpack.unpackb(await request.body(), raw=False)
+        plan_request = DietPlanRequest(**payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid msgpack body: {e}")
+
+    return await generate_adaptive_plan(plan_request)
+
+@app.get("/single-flight/stats")
+async def single_flight_stats():
+    return single_flight.stats()
+
+@app.get("/llm/stats")
+async def llm_stats():
+    return {
+        "routes": llm_routes,
+        "local_backend": type(local_llm).__name__ if local_llm is not None else None,
+        "local": local_llm.get_stats() if hasattr(local_llm, "get_stats") else None,
+    }
+
+@app.get("/prompt-stats")
+async def prompt_stats():
+    return get_prompt_stats()
+
+@app.get("/kid-faq/stats")
+async def kid_faq_stats():
+    if kid_faq is None:
+        return {"enabled": False}
+    return {"enabled": True, **kid_faq.get_stats()}
+
+@app.get("/risk-rules/stats")
+async def risk_rule_stats():
+    get_rule_set()  # pick up any pending rule file edits
+    return get_rule_stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
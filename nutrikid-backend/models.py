@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Dict, Optional, Any
 
 class NutrientGoal(BaseModel):
@@ -14,6 +14,25 @@ class MealLogItem(BaseModel):
     meal_type: str  # "Breakfast", "Lunch", "Dinner", "Snack"
     nutrients: Optional[Dict[str, Any]] = {}
 
+class MealLogColumns(BaseModel):
+    """Columnar form of meal_logs: one array per field, index i describes meal i."""
+    names: List[str]
+    portions: List[str]
+    dates: List[str]
+    meal_types: List[str]
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        n = len(self.names)
+        for field in ("portions", "dates", "meal_types"):
+            values = getattr(self, field)
+            if len(values) != n:
+                raise ValueError(f"meal_columns.{field} has {len(values)} entries, expected {n}")
+        return self
+
+    def __len__(self):
+        return len(self.names)
+
 class ChildProfile(BaseModel):
     age: int
     weight: str
@@ -25,10 +44,17 @@ class ChildProfile(BaseModel):
 
 class DietPlanRequest(BaseModel):
     child_profile: ChildProfile
-    meal_logs: List[MealLogItem]  # Last 14-30 days
+    meal_logs: Optional[List[MealLogItem]] = None  # Last 14-30 days
+    meal_columns: Optional[MealLogColumns] = None  # Compact alternative to meal_logs
     duration_days: int = 7
     doctor_notes: Optional[str] = ""
 
+    @model_validator(mode="after")
+    def check_one_encoding(self):
+        if (self.meal_logs is None) == (self.meal_columns is None):
+            raise ValueError("Send exactly one of meal_logs or meal_columns")
+        return self
+
 class DayPlan(BaseModel):
     breakfast: str
     lunch: str
@@ -36,6 +62,27 @@ class DayPlan(BaseModel):
     snacks: str
     nutrient_focus: List[str]
 
+class GeneratedPlan(BaseModel):
+    """JSON the LLM is asked to return for a diet plan (see plan_generator.meals_prompt)."""
+    weekly_summary: str
+    expected_improvements: Dict[str, str] = {}
+    plan_score: Dict[str, int] = {}
+    days: Dict[str, DayPlan]
+
+class NutrientGap(BaseModel):
+    nutrient: str
+    status: str  # "Low", "Very Low"
+    current_estimated: str
+    target: str
+    suggestion: str
+
+class NutritionAnalysis(BaseModel):
+    """JSON the LLM is asked to return from /analyze."""
+    analysis_summary: str
+    deficiencies: List[NutrientGap] = []
+    score: int
+    intake_truncated: bool = False  # set by /analyze when the meal list was cut to fit the prompt
+
 class DietPlanResponse(BaseModel):
     status: str  # "GENERATED", "REQUIRES_DOCTOR_REVIEW"
     reason: Optional[str] = None
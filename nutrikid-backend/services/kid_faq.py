@@ -0,0 +1,160 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+# Reviewed Food Buddy answers, built offline by build_kid_faq.py
+KID_FAQ_PATH = os.getenv("KID_FAQ_PATH", "kid_faq.db")
+# Cosine similarity a kid question needs to reuse a stored answer
+KID_FAQ_THRESHOLD = float(os.getenv("KID_FAQ_THRESHOLD", "0.82"))
+
+AGE_BANDS = {
+    "3-5": (0, 5),
+    "6-8": (6, 8),
+    "9-12": (9, 120),
+}
+DEFAULT_BAND = "6-8"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    faq_id TEXT NOT NULL,
+    band TEXT NOT NULL,
+    answer TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    answer_id INTEGER NOT NULL REFERENCES answers(id),
+    text TEXT NOT NULL,
+    embedding BLOB NOT NULL
+);
+"""
+
+
+def age_band(age: Any) -> str:
+    """"5 years" / 5 -> "3-5"; unparseable ages get the middle band."""
+    match = re.search(r"\d+", str(age))
+    if not match:
+        return DEFAULT_BAND
+    years = int(match.group(0))
+    for band, (low, high) in AGE_BANDS.items():
+        if low <= years <= high:
+            return band
+    return DEFAULT_BAND
+
+
+def write_bank(path: str, entries: List[Dict[str, Any]], embedder, model_name: str):
+    """
+    Writes reviewed entries ({faq_id, band, questions: [...], answer}) to a fresh store.
+    Every question phrasing is embedded (normalised) with the server's embedder.
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(SCHEMA)
+    dim = None
+    for entry in entries:
+        cursor = conn.execute(
+            "INSERT INTO answers (faq_id, band, answer) VALUES (?, ?, ?)",
+            (entry["faq_id"], entry["band"], entry["answer"])
+        )
+        vectors = np.asarray(embedder.encode(entry["questions"], normalize_embeddings=True), dtype="float32")
+        dim = vectors.shape[1]
+        conn.executemany(
+            "INSERT INTO questions (answer_id, text, embedding) VALUES (?, ?, ?)",
+            [(cursor.lastrowid, text, vector.tobytes()) for text, vector in zip(entry["questions"], vectors)]
+        )
+    conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+        ("model", model_name),
+        ("dim", str(dim or 0)),
+        ("built_at", str(int(time.time()))),
+    ])
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)  # running servers keep reading the old file until restart
+
+
+class KidFaqBank:
+    """
+    Question embeddings live in an in-memory FAISS index (a few hundred rows); answer
+    text stays on disk in sqlite and is read only on a hit.
+    """
+
+    def __init__(self, path: str, threshold: float = KID_FAQ_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+
+        rows = self._conn.execute(
+            "SELECT q.answer_id, a.band, q.embedding FROM questions q JOIN answers a ON a.id = q.answer_id ORDER BY q.id"
+        ).fetchall()
+        self._answer_ids = [r[0] for r in rows]
+        self._bands = [r[1] for r in rows]
+        dim = int(self.meta.get("dim", 0))
+        self.index = faiss.IndexFlatIP(dim)
+        if rows:
+            self.index.add(np.vstack([np.frombuffer(r[2], dtype="float32") for r in rows]))
+        self.stats = {"hits": 0, "misses": 0, "lookup_seconds": 0.0}
+
+    @classmethod
+    def load(cls, path: str, model_name: str) -> Optional["KidFaqBank"]:
+        """Returns None (live path only) if the store is missing or built with a different embedder."""
+        if not os.path.exists(path):
+            print(f"Kid FAQ bank '{path}' not found. Kid questions will use the live RAG + LLM path.")
+            return None
+        try:
+            bank = cls(path)
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Warning: Failed to load kid FAQ bank: {e}")
+            return None
+        if bank.meta.get("model") != model_name:
+            print(f"Warning: Kid FAQ bank was built with {bank.meta.get('model')}, server uses {model_name}. Disabled.")
+            return None
+        print(f"Loaded kid FAQ bank with {bank.index.ntotal} question phrasings.")
+        return bank
+
+    def lookup(self, query_embedding: np.ndarray, age: Any) -> Optional[str]:
+        start = time.perf_counter()
+        vector = np.array(query_embedding, dtype="float32").reshape(1, -1)
+        faiss.normalize_L2(vector)
+        band = age_band(age)
+
+        answer = None
+        if self.index.ntotal:
+            scores, rows = self.index.search(vector, min(16, self.index.ntotal))
+            for score, row in zip(scores[0], rows[0]):
+                if score < self.threshold:
+                    break
+                if row >= 0 and self._bands[row] == band:
+                    with self._lock:
+                        found = self._conn.execute(
+                            "SELECT answer FROM answers WHERE id = ?", (self._answer_ids[row],)
+                        ).fetchone()
+                    answer = found[0] if found else None
+                    break
+
+        self.stats["hits" if answer else "misses"] += 1
+        self.stats["lookup_seconds"] += time.perf_counter() - start
+        return answer
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.stats["hits"] + self.stats["misses"]
+        return {
+            "hits": self.stats["hits"],
+            "misses": self.stats["misses"],
+            "hit_rate": round(self.stats["hits"] / total, 4) if total else 0.0,
+            "avg_lookup_ms": round(self.stats["lookup_seconds"] / total * 1000, 3) if total else 0.0,
+            "phrasings": self.index.ntotal,
+            "model": self.meta.get("model"),
+            "built_at": self.meta.get("built_at"),
+        }
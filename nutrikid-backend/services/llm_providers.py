@@ -0,0 +1,222 @@
+import abc
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from .prompts import PROMPT_BUDGETS
+
+# Routes are the prompt names from services/prompts.py: ask_kid, ask_parent, analyze, diet_plan.
+# LLM_ROUTES="ask_kid=local,analyze=local" sends those to the local backend; everything else
+# keeps using the hosted HF client (with Gemini fallback).
+LLM_ROUTES = os.getenv("LLM_ROUTES", "")
+BACKENDS = ("local", "hf")
+
+# "transformers": small instruct model loaded in-process on CPU, batched by a worker thread
+# "openai": a local OpenAI-compatible server (llama.cpp --cont-batching, vLLM, Ollama) at LOCAL_LLM_URL
+LOCAL_LLM_BACKEND = os.getenv("LOCAL_LLM_BACKEND", "transformers")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "Qwen/Qwen2.5-0.5B-Instruct")
+LOCAL_LLM_URL = os.getenv("LOCAL_LLM_URL", "http://127.0.0.1:8080")
+LOCAL_LLM_MAX_BATCH = int(os.getenv("LOCAL_LLM_MAX_BATCH", "8"))
+LOCAL_LLM_BATCH_WINDOW_MS = float(os.getenv("LOCAL_LLM_BATCH_WINDOW_MS", "20"))
+
+
+def parse_routes(spec: str) -> Dict[str, str]:
+    """
+    "ask_kid=local, analyze=local" -> {"ask_kid": "local", "analyze": "local"}
+    Unknown route names or backends are reported and skipped, so a typo doesn't
+    silently leave an endpoint on the hosted model.
+    """
+    routes = {}
+    for part in spec.split(","):
+        name, _, backend = part.strip().partition("=")
+        name, backend = name.strip(), backend.strip() or "local"
+        if not name:
+            continue
+        if name not in PROMPT_BUDGETS:
+            print(f"Warning: Unknown LLM route '{name}' in LLM_ROUTES (expected one of {', '.join(PROMPT_BUDGETS)}). Ignored.")
+            continue
+        if backend not in BACKENDS:
+            print(f"Warning: Unknown backend '{backend}' for LLM route '{name}' (expected one of {', '.join(BACKENDS)}). Ignored.")
+            continue
+        routes[name] = backend
+    return routes
+
+
+def _completion(content: str) -> Any:
+    """Shaped like InferenceClient.chat_completion's output: .choices[0].message.content"""
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")])
+
+
+class _Request:
+    __slots__ = ("messages", "max_tokens", "temperature", "future", "queued_at")
+
+    def __init__(self, messages, max_tokens, temperature):
+        self.messages = messages
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+
+
+class BatchingChatProvider(abc.ABC):
+    """
+    chat_completion() that queues the request for a single worker thread, which
+    drains whatever else arrived within the batch window (up to max_batch_size)
+    and generates for all of them in one forward pass per step. Requests that
+    come in during a generation form the next batch, so the model stays busy
+    under concurrent load without callers coordinating.
+
+    Subclasses implement _generate(batch) -> list of strings.
+    """
+
+    def __init__(self, max_batch_size: int = LOCAL_LLM_MAX_BATCH, batch_window_ms: float = LOCAL_LLM_BATCH_WINDOW_MS):
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_window = batch_window_ms / 1000
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self.stats = {"requests": 0, "batches": 0, "errors": 0, "abandoned": 0,
+                      "queue_seconds": 0.0, "generate_seconds": 0.0}
+        self._worker = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._worker.start()
+
+    def chat_completion(self, messages: List[Dict[str, str]], max_tokens: int = 512,
+                        temperature: float = 0.0, timeout: Optional[float] = 300, **kwargs) -> Any:
+        # response_format and other hosted-only options are accepted and ignored;
+        # callers validate JSON output themselves (services/structured_output.py)
+        request = _Request(messages, max_tokens, temperature or 0.0)
+        self._queue.put(request)
+        try:
+            return _completion(request.future.result(timeout=timeout))
+        except FutureTimeout:
+            # The worker skips it if generation hasn't started yet
+            request.future.cancel()
+            raise
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Drop requests whose caller already timed out; this also marks the rest as running
+            live = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            self.stats["abandoned"] += len(batch) - len(live)
+            batch = live
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            for request in batch:
+                self.stats["queue_seconds"] += start - request.queued_at
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+
+            # Greedy and sampled requests can't share one generate() call
+            groups: Dict[float, List[_Request]] = {}
+            for request in batch:
+                groups.setdefault(round(request.temperature, 2), []).append(request)
+            for group in groups.values():
+                try:
+                    outputs = list(self._generate(group))
+                    for request, text in zip(group, outputs):
+                        request.future.set_result(text)
+                    if len(outputs) < len(group):
+                        raise RuntimeError(f"{type(self).__name__} returned {len(outputs)} outputs for {len(group)} requests")
+                except Exception as e:
+                    # Every caller gets an answer or an error, never a wait for the full timeout
+                    unresolved = [r for r in group if not r.future.done()]
+                    self.stats["errors"] += len(unresolved)
+                    for request in unresolved:
+                        request.future.set_exception(e)
+            self.stats["generate_seconds"] += time.perf_counter() - start
+
+    @abc.abstractmethod
+    def _generate(self, batch: List[_Request]) -> List[str]:
+        """One output string per request, in batch order."""
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self.stats["requests"] or 1
+        batches = self.stats["batches"] or 1
+        return {
+            "requests": self.stats["requests"],
+            "batches": self.stats["batches"],
+            "errors": self.stats["errors"],
+            "abandoned": self.stats["abandoned"],
+            "avg_batch_size": round(self.stats["requests"] / batches, 2),
+            "avg_queue_ms": round(self.stats["queue_seconds"] / requests * 1000, 2),
+            "avg_batch_ms": round(self.stats["generate_seconds"] / batches * 1000, 2),
+            "queued": self._queue.qsize(),
+        }
+
+
+class LocalTransformersProvider(BatchingChatProvider):
+    """Small instruct model on CPU via transformers, int8 dynamic-quantized by default."""
+
+    def __init__(self, model_name: str = LOCAL_LLM_MODEL, quantize: bool = True, **kwargs):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        print(f"Loading local LLM {model_name} (CPU{', int8' if quantize else ''})...")
+        self._torch = torch
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.tokenizer.padding_side = "left"  # generation continues from the right edge
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32)
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model.eval()
+        super().__init__(**kwargs)
+
+    def _generate(self, batch: List[_Request]) -> List[str]:
+        prompts = [
+            self.tokenizer.apply_chat_template(r.messages, tokenize=False, add_generation_prompt=True)
+            for r in batch
+        ]
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        temperature = batch[0].temperature
+        sampling = {"do_sample": True, "temperature": temperature} if temperature > 0 else {"do_sample": False}
+
+        with self._torch.inference_mode():
+            output = self.model.generate(
+                **inputs,
+                max_new_tokens=max(r.max_tokens for r in batch),
+                pad_token_id=self.tokenizer.pad_token_id,
+                **sampling
+            )
+
+        prompt_len = inputs["input_ids"].shape[1]
+        # Each request only gets the tokens it asked for, even if the batch ran longer
+        return [
+            self.tokenizer.decode(output[i, prompt_len:prompt_len + r.max_tokens], skip_special_tokens=True).strip()
+            for i, r in enumerate(batch)
+        ]
+
+
+def create_local_provider() -> Optional[Any]:
+    """Builds the configured local backend, or None if it can't be started."""
+    try:
+        if LOCAL_LLM_BACKEND == "openai":
+            # The server does its own continuous batching; InferenceClient speaks its protocol
+            from huggingface_hub import InferenceClient
+            print(f"Using local OpenAI-compatible LLM server at {LOCAL_LLM_URL}")
+            return InferenceClient(base_url=LOCAL_LLM_URL)
+        if LOCAL_LLM_BACKEND == "transformers":
+            return LocalTransformersProvider(LOCAL_LLM_MODEL)
+        print(f"Warning: Unknown LOCAL_LLM_BACKEND '{LOCAL_LLM_BACKEND}'.")
+    except Exception as e:
+        print(f"Warning: Failed to start local LLM backend ({e}). Routed endpoints will use the hosted LLM.")
+    return None
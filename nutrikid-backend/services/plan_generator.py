@@ -1,8 +1,10 @@
+import asyncio
 from typing import Dict, Any, List
 from huggingface_hub import InferenceClient
-from models import DayPlan, DietPlanResponse
-import json
-import re
+from pydantic import ValidationError
+from models import DayPlan, DietPlanResponse, GeneratedPlan
+from .prompts import PLAN_PROMPT
+from .structured_output import extract_json
 
 async def generate_diet_plan(
     hf_client: InferenceClient,
@@ -15,52 +17,25 @@ async def generate_diet_plan(
 ) -> DietPlanResponse:
     
     # 1. Structure Prompt
-    # Inject context, restrictions (veg/non), and deficiencies
-    
-    meals_prompt = f"""
-    You are an Expert Pediatric Clinical Dietitian (AI Assistant).
-    
-    Your TASK: Generating a personalized {duration}-Day Meal Plan.
-    Patient Profile:
-    - Age: {profile.get('age', 5)}
-    - Weight: {profile.get('weight', 'Unknown')}
-    - Conditions: {', '.join(profile.get('conditions', []))}
-    - Allergies: {', '.join(profile.get('allergies', []))}
-    - Diet Pref: {', '.join(profile.get('preferences', ['Balanced']))}
-    
-    Clinically Identified Deficiencies (PRIORITY):
-    {', '.join([f"{d.nutrient} ({d.gap})" for d in deficiencies])}
-
-    Doctor Notes: {doctor_notes}
-
-    RULES:
-    1. STRICTLY follow dietary preferences (Veg/Non-Veg).
-    2. Suggest Indian home-cooked meals (simple, nutritious).
-    3. Incorporate specific foods to fix deficiencies (e.g. Ragi for Calcium).
-    4. Provide calorie distribution: Breakfast (heavy), Lunch (balanced), Dinner (light).
-    5. Output JSON ONLY.
-    
-    JSON SCHEMA:
-    {{
-      "weekly_summary": "Short clinical summary of the plan strategy.",
-      "expected_improvements": {{ "Iron": "High", "Calcium": "Moderate" }},
-      "plan_score": {{ "nutrition_score": 85, "diversity_score": 90, "overall_score": 88 }},
-      "days": {{
-        "day_1": {{
-          "breakfast": "Description",
-          "lunch": "Description",
-          "dinner": "Description",
-          "snacks": "Description",
-          "nutrient_focus": ["Iron", "Fiber"]
-        }},
-        ... (repeat for {duration} days)
-      }}
-    }}
-    """
+    # Inject context, restrictions (veg/non), and deficiencies after the fixed instructions
+    rendered = PLAN_PROMPT.render({
+        "duration": duration,
+        "age": profile.get('age', 5),
+        "weight": profile.get('weight', 'Unknown'),
+        "conditions": ', '.join(profile.get('conditions', [])),
+        "allergies": ', '.join(profile.get('allergies', [])),
+        "preferences": ', '.join(profile.get('preferences', ['Balanced'])),
+        "deficiencies": ', '.join([f"{d.nutrient} ({d.gap})" for d in deficiencies]),
+        "doctor_notes": doctor_notes,
+    })
+    meals_prompt = rendered.text
+    # Notes are the only section cut to fit the budget; the reviewing doctor has to know
+    notes_truncated = "notes" in rendered.trimmed
 
     try:
         if hf_client:
-            response = hf_client.chat_completion(
+            response = await asyncio.to_thread(
+                hf_client.chat_completion,
                 messages=[{"role": "user", "content": meals_prompt}],
                 max_tokens=1500,  # Increased for multi-day plan
                 temperature=0.2,  # Low temp for deterministic structure
@@ -74,7 +49,8 @@ async def generate_diet_plan(
         print(f"HF Error in generate_diet_plan: {e}. Falling back to Gemini...")
         if gemini_client:
              try:
-                 response = gemini_client.models.generate_content(
+                 response = await asyncio.to_thread(
+                     gemini_client.models.generate_content,
                      model='gemini-2.5-flash',
                      contents=meals_prompt,
                  )
@@ -94,20 +70,29 @@ async def generate_diet_plan(
                  reason=f"AI Generation Failed: HF({str(e)}) and Gemini unavailable"
              )
         
+    try:
         # 2. Extract JSON
-        # Robust parsing
-        json_match = re.search(r'\{.*\}', content, re.DOTALL)
-        if json_match:
-            plan_data = json.loads(json_match.group(0))
-        else:
-             # Fallback structure if LLM fails format
-             plan_data = {"weekly_summary": "Error parsing plan.", "days": {}}
-             
+        # Balanced-brace scan + schema check; truncated output is closed at the last complete value
+        result = extract_json(content, GeneratedPlan)
+        plan_data = result.data or {"weekly_summary": "Error parsing plan.", "days": {}}
+        if not result.ok:
+            print(f"Plan JSON incomplete (repaired={result.repaired}). Failed fields: {result.failed_fields}")
+
+        days = _valid_days(plan_data.get("days"))
+
+        # Re-request only the days that are missing or invalid instead of regenerating the plan
+        if len(days) < duration:
+            missing = [f"day_{i}" for i in range(1, duration + 1) if f"day_{i}" not in days][:duration - len(days)]
+            days.update(await _request_missing_days(hf_client, gemini_client, meals_prompt, days, missing))
+            days = dict(sorted(days.items(), key=lambda item: _day_number(item[0])))
+
         # 3. Transform to Pydantic Response
-        # (Assuming DayPlan model matches or map it)
-        
+        failed_top_level = {f.split(".")[0] for f in result.failed_fields}
+
         # calculate dummy scores if missing
-        scores = plan_data.get("plan_score", {"nutrition_score": 80, "diversity_score": 80, "overall_score": 80})
+        scores = plan_data.get("plan_score") if "plan_score" not in failed_top_level else None
+        scores = scores or {"nutrition_score": 80, "diversity_score": 80, "overall_score": 80}
+        improvements = plan_data.get("expected_improvements") if "expected_improvements" not in failed_top_level else None
 
         # Generate summary for doctor using separate function or extraction
         doc_summary = {
@@ -115,15 +100,19 @@ async def generate_diet_plan(
             "risk_flags": [risk_level],
             "recommendation": "Approve for 2-week trial."
         }
+        if notes_truncated:
+            doc_summary["doctor_notes_truncated"] = True
+            doc_summary["recommendation"] = "Doctor notes were too long and were truncated for the AI. Check the plan against the full notes before approving."
 
         return DietPlanResponse(
             status="GENERATED",
+            reason="Doctor notes were truncated to fit the AI prompt." if notes_truncated else None,
             risk_level=risk_level,
             priority_focus=[d.nutrient for d in deficiencies],
-            weekly_summary=plan_data.get("weekly_summary", "Plan generated."),
-            expected_improvements=plan_data.get("expected_improvements", {}),
+            weekly_summary=plan_data.get("weekly_summary") or "Plan generated.",
+            expected_improvements=improvements or {},
             plan_score=scores,
-            days=plan_data.get("days", {}),
+            days=days,
             doctor_summary=doc_summary
         )
 
@@ -134,3 +123,67 @@ async def generate_diet_plan(
             risk_level="ERROR",
             reason=f"Plan Generation Failed during JSON processing: {str(e)}"
         )
+
+def _valid_days(raw_days: Any) -> Dict[str, DayPlan]:
+    """Keeps the days that match the DayPlan schema; invalid ones are treated as missing."""
+    days = {}
+    if not isinstance(raw_days, dict):
+        return days
+    for key, raw in raw_days.items():
+        try:
+            days[key] = DayPlan(**raw)
+        except (TypeError, ValidationError):
+            print(f"Dropping invalid plan entry '{key}'")
+    return days
+
+def _day_number(key: str) -> int:
+    digits = "".join(ch for ch in key if ch.isdigit())
+    return int(digits) if digits else 10**6
+
+async def _request_missing_days(
+    hf_client: InferenceClient,
+    gemini_client: Any,
+    meals_prompt: str,
+    days: Dict[str, DayPlan],
+    missing: List[str]
+) -> Dict[str, DayPlan]:
+    """Follow-up call for just the missing days; returns whatever valid days come back."""
+    print(f"Requesting missing plan days: {missing}")
+    follow_up = f"""{meals_prompt}
+
+The plan was cut short. Already planned: {', '.join(days) or 'none'}.
+Return JSON ONLY containing the missing days, each with the same fields as above:
+{{ "days": {{ {', '.join(f'"{key}": {{ ... }}' for key in missing)} }} }}
+"""
+
+    content = None
+    try:
+        if hf_client:
+            response = await asyncio.to_thread(
+                hf_client.chat_completion,
+                messages=[{"role": "user", "content": follow_up}],
+                max_tokens=250 * len(missing),
+                temperature=0.2,
+                response_format={"type": "json_object"}
+            )
+            content = response.choices[0].message.content
+        else:
+            raise Exception("HF Client not properly defined.")
+    except Exception as e:
+        print(f"HF Error requesting missing days: {e}. Falling back to Gemini...")
+        if gemini_client:
+            try:
+                response = await asyncio.to_thread(
+                    gemini_client.models.generate_content,
+                    model='gemini-2.5-flash',
+                    contents=follow_up,
+                )
+                content = response.text
+            except Exception as gemini_e:
+                print(f"Gemini fallback failed requesting missing days: {gemini_e}")
+
+    if not content:
+        return {}
+    result = extract_json(content)
+    recovered = _valid_days((result.data or {}).get("days"))
+    return {key: day for key, day in recovered.items() if key in missing}
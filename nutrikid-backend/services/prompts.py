@@ -0,0 +1,312 @@
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# =============================
+# Token Counting
+# =============================
+# PROMPT_TOKENIZER names a HF tokenizer (e.g. HuggingFaceH4/zephyr-7b-beta) for exact counts;
+# without it a ~4 characters/token estimate is used, which is close enough for budgets.
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+
+def _get_tokenizer():
+    global _tokenizer, _tokenizer_loaded
+    if _tokenizer_loaded:
+        return _tokenizer
+    with _tokenizer_lock:
+        if not _tokenizer_loaded:
+            name = os.getenv("PROMPT_TOKENIZER")
+            if name:
+                try:
+                    from transformers import AutoTokenizer
+                    _tokenizer = AutoTokenizer.from_pretrained(name)
+                    print(f"Prompt token accounting uses tokenizer {name}")
+                except Exception as e:
+                    print(f"Warning: Could not load tokenizer {name} ({e}). Using character estimate.")
+            _tokenizer_loaded = True
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+    return math.ceil(len(text) / 4)
+
+
+# =============================
+# Templates
+# =============================
+class RenderedPrompt:
+    def __init__(self, text: str, body: str, history: List[Any], tokens: Dict[str, int], trimmed: List[str]):
+        self.text = text  # instructions + body, for single-message prompts
+        self.body = body  # per-request sections only
+        self.history = history  # history messages that fit the budget, oldest first
+        self.tokens = tokens  # per section, plus "total"
+        self.trimmed = trimmed  # sections that had to be cut to fit
+
+
+class PromptTemplate:
+    """
+    A fixed instruction block followed by per-request sections.
+
+    The instructions are a module constant and their token count is computed once.
+    To keep them a cacheable prefix they must be the first thing the model sees:
+    single-message prompts send `text` (instructions, then the sections); chat
+    prompts send `instructions` as the system message, then the history, then
+    `body` (the sections only) as the final user message.
+
+    `sections` is an ordered list of (name, format string). `trimmable` names the
+    sections (and "history") that may be shortened, in order, to meet `budget`.
+    The last `keep_history` history messages (the latest exchange, e.g. a clarifying
+    question and the parent's reply) are never trimmed.
+    """
+
+    def __init__(self, name: str, instructions: str, sections: List[Tuple[str, str]],
+                 budget: int, trimmable: Tuple[str, ...] = (), keep_history: int = 2):
+        self.name = name
+        self.instructions = instructions.strip()
+        self.sections = sections
+        self.budget = budget
+        self.trimmable = trimmable
+        self.keep_history = keep_history
+        self._instruction_tokens = None
+
+    @property
+    def instruction_tokens(self) -> int:
+        if self._instruction_tokens is None:
+            self._instruction_tokens = count_tokens(self.instructions)
+        return self._instruction_tokens
+
+    def render(self, values: Dict[str, Any], history: Optional[List[Any]] = None) -> RenderedPrompt:
+        parts = {name: fmt.format(**values).strip() for name, fmt in self.sections}
+        history = list(history or [])
+
+        tokens = {"instructions": self.instruction_tokens}
+        tokens.update({name: count_tokens(text) for name, text in parts.items()})
+        tokens["history"] = sum(count_tokens(_content(m)) for m in history)
+
+        trimmed = []
+        for section in self.trimmable:
+            over = sum(tokens.values()) - self.budget
+            if over <= 0:
+                break
+            if section == "history":
+                # Oldest turns go first; the latest exchange stays
+                while len(history) > self.keep_history and over > 0:
+                    removed = count_tokens(_content(history.pop(0)))
+                    tokens["history"] -= removed
+                    over -= removed
+            elif parts.get(section):
+                keep = max(0, tokens[section] - over - count_tokens(TRUNCATION_MARKER))
+                parts[section] = _truncate(parts[section], keep, tokens[section])
+                tokens[section] = count_tokens(parts[section])
+            trimmed.append(section)
+
+        tokens["total"] = sum(tokens.values())
+        if tokens["total"] > self.budget:
+            print(f"Warning: {self.name} prompt is {tokens['total']} tokens, over its {self.budget} budget.")
+
+        body = "\n\n".join(parts[name] for name, _ in self.sections if parts[name])
+        _record(self.name, tokens, trimmed)
+        return RenderedPrompt(self.instructions + "\n\n" + body, body, history, tokens, trimmed)
+
+
+TRUNCATION_MARKER = "\n[...]"
+
+
+def _content(message: Any) -> str:
+    if isinstance(message, dict):
+        return message.get("content", "")
+    return getattr(message, "content", "")
+
+
+def _truncate(text: str, keep_tokens: int, current_tokens: int) -> str:
+    if keep_tokens <= 0:
+        return ""
+    cut = int(len(text) * keep_tokens / max(1, current_tokens))
+    return text[:cut].rstrip() + TRUNCATION_MARKER
+
+
+KID_INSTRUCTIONS = """
+You are Food Buddy, a fun and friendly nutrition companion for kids! 🥦🦁
+
+RULES:
+- Start with a fun greeting!
+- Use a storyteller voice.
+- If asked for a story, make up a short, fun adventure about food heroes!
+- Use simple words and lots of emojis.
+- Explain things using superheroes (e.g., "Carrots give you X-ray vision like a hero!").
+- Do NOT give medical advice.
+- If asked about medicine, say "Ask a grown-up!".
+- Structure your answer nicely using bullet points and short paragraphs.
+"""
+
+PARENT_INSTRUCTIONS = """
+You are NutriGuide AI, an advanced pediatric nutrition assistant.
+
+STRICT INSTRUCTIONS:
+1. If the user's question involves a symptom (e.g., fever, stomach ache) and lacks crucial context (e.g., how many days they've had it, severity, other symptoms), you MUST ask 1-2 brief follow-up questions to gather more information BEFORE giving a detailed answer.
+2. If you have enough context, first provide a **Direct, Short Answer** (2-3 sentences max) with practical and immediate advice.
+3. Then, output exactly this separator: |||DETAILED|||
+4. After the separator, provide a **Detailed Explanation**. Use Markdown formatting (### for headers, - for bullets, **bold** for key terms). Explain *why* and give specific examples.
+5. Do NOT output |||DETAILED||| if you are just asking a clarifying question.
+
+Format if answering:
+[Short Answer]
+|||DETAILED|||
+[Detailed Markdown Explanation]
+
+Format if asking clarifying question:
+[Just ask the question naturally and empathetically]
+"""
+
+ANALYSIS_INSTRUCTIONS = """
+You are a Clinical Pediatric Nutritionist AI.
+Explain the micronutrient gaps based on the child's intake today vs Recommended Dietary Allowance (RDA) for the child's age given below.
+
+Task:
+1. Estimate the micronutrient content (Iron, Calcium, Vit A, Vit C, Vit D, Zinc, Magnesium).
+2. Compare against RDA for the child's age.
+3. Identify SUBSTANTIAL deficiencies (Gaps).
+4. For each gap, suggest 1 specific food to add.
+
+Format the output strictly as JSON:
+```json
+{
+  "analysis_summary": "Short clinical summary (max 2 sentences).",
+  "deficiencies": [
+    {
+      "nutrient": "Iron",
+      "status": "Low" | "Very Low",
+      "current_estimated": "3mg",
+      "target": "10mg",
+      "suggestion": "Add spinach or lentils"
+    }
+  ],
+  "score": 85
+}
+```
+Do not include any text outside the JSON block.
+"""
+
+PLAN_INSTRUCTIONS = """
+You are an Expert Pediatric Clinical Dietitian (AI Assistant).
+
+RULES:
+1. STRICTLY follow dietary preferences (Veg/Non-Veg).
+2. Suggest Indian home-cooked meals (simple, nutritious).
+3. Incorporate specific foods to fix deficiencies (e.g. Ragi for Calcium).
+4. Provide calorie distribution: Breakfast (heavy), Lunch (balanced), Dinner (light).
+5. Output JSON ONLY.
+
+JSON SCHEMA:
+{
+  "weekly_summary": "Short clinical summary of the plan strategy.",
+  "expected_improvements": { "Iron": "High", "Calcium": "Moderate" },
+  "plan_score": { "nutrition_score": 85, "diversity_score": 90, "overall_score": 88 },
+  "days": {
+    "day_1": {
+      "breakfast": "Description",
+      "lunch": "Description",
+      "dinner": "Description",
+      "snacks": "Description",
+      "nutrient_focus": ["Iron", "Fiber"]
+    },
+    ... (one entry per day, day_1 to day_N)
+  }
+}
+"""
+
+# Prompt-token budgets per endpoint (output tokens are set separately via max_tokens)
+PROMPT_BUDGETS = {
+    "ask_kid": 1500,
+    "ask_parent": 2500,
+    "analyze": 1000,
+    "diet_plan": 1200,
+}
+
+KID_PROMPT = PromptTemplate(
+    "ask_kid",
+    KID_INSTRUCTIONS,
+    [
+        ("profile", "Information about the kid:\nAge: {age}"),
+        ("context", "Context:\n{context}"),
+        ("question", "Question: {question}\n\nAnswer like a best friend:"),
+    ],
+    budget=PROMPT_BUDGETS["ask_kid"],
+    trimmable=("history", "context"),
+)
+
+PARENT_PROMPT = PromptTemplate(
+    "ask_parent",
+    PARENT_INSTRUCTIONS,
+    [
+        ("profile", "Profile:\nAge: {age}\nWeight: {weight}\nConditions: {conditions}\nPrescriptions: {prescription}"),
+        ("context", "Context:\n{context}"),
+        ("question", "Question: {question}"),
+    ],
+    budget=PROMPT_BUDGETS["ask_parent"],
+    trimmable=("history", "context"),
+)
+
+ANALYSIS_PROMPT = PromptTemplate(
+    "analyze",
+    ANALYSIS_INSTRUCTIONS,
+    [
+        ("profile", "Child age: {age} years"),
+        ("intake", "Intake Today: {meals}"),
+    ],
+    budget=PROMPT_BUDGETS["analyze"],
+    trimmable=("intake",),
+)
+
+PLAN_PROMPT = PromptTemplate(
+    "diet_plan",
+    PLAN_INSTRUCTIONS,
+    [
+        ("task", "Your TASK: Generating a personalized {duration}-Day Meal Plan."),
+        ("profile", "Patient Profile:\n- Age: {age}\n- Weight: {weight}\n- Conditions: {conditions}\n"
+                    "- Allergies: {allergies}\n- Diet Pref: {preferences}"),
+        ("deficiencies", "Clinically Identified Deficiencies (PRIORITY):\n{deficiencies}"),
+        ("notes", "Doctor Notes: {doctor_notes}"),
+    ],
+    budget=PROMPT_BUDGETS["diet_plan"],
+    trimmable=("notes",),
+)
+
+
+# =============================
+# Prompt Metrics
+# =============================
+_prompt_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def _record(name: str, tokens: Dict[str, int], trimmed: List[str]):
+    stats = _prompt_stats.setdefault(name, {"renders": 0, "trimmed": 0, "max_total": 0, "sections": {}})
+    stats["renders"] += 1
+    stats["trimmed"] += 1 if trimmed else 0
+    stats["max_total"] = max(stats["max_total"], tokens["total"])
+    for section, count in tokens.items():
+        stats["sections"][section] = stats["sections"].get(section, 0) + count
+
+
+def get_prompt_stats() -> Dict[str, Any]:
+    """Average tokens per prompt section for each endpoint, plus budget and trim counts."""
+    result = {}
+    for name, stats in _prompt_stats.items():
+        renders = stats["renders"] or 1
+        result[name] = {
+            "renders": stats["renders"],
+            "budget": PROMPT_BUDGETS.get(name),
+            "trimmed": stats["trimmed"],
+            "max_total_tokens": stats["max_total"],
+            "avg_tokens": {section: round(total / renders, 1) for section, total in stats["sections"].items()},
+        }
+    return result
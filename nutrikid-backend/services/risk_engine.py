@@ -1,57 +1,51 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from .risk_rules import RuleContext, RuleHit, get_rule_set
 
 class NutrientRisk(BaseModel):
     nutrient: str
     status: str
     gap: str
 
+class RiskFlag(BaseModel):
+    rule_id: str
+    severity: str  # "critical", "warning"
+    message: str
+
 class RiskAssessment(BaseModel):
     risk_level: str  # "LOW", "MODERATE", "HIGH"
     flags: List[str]
     can_generate_plan: bool
     reason: Optional[str] = None
+    rule_flags: List[RiskFlag] = []
 
 def assess_risk(profile: dict, deficiencies: List[NutrientRisk], doctor_notes: str) -> RiskAssessment:
     """
     Hybrid Risk Engine:
-    1. Deterministic Rules (BMI, Severe Deficiencies)
+    1. Deterministic Rules (BMI, Severe Deficiencies, Conditions, Notes) from risk_rules.json
     2. LLM Context Analysis (Medical history in notes)
     """
-    flags = []
-    
-    # 1. BMI Check (Simplified)
-    # in production, calculate BMI z-score properly
-    try:
-        age = profile.get("age", 5)
-        weight = float(profile.get("weight", "0").split()[0]) # "20 kg" -> 20.0
-        
-        # Very rough underweight check for demo purpose
-        # active severe malnutrition check
-        if age > 1 and weight < (age * 2 + 5): 
-             flags.append("Potential Underweight (red flag)")
-             
-    except:
-        pass
+    ctx = RuleContext(profile, deficiencies, doctor_notes)
+    return _decide(get_rule_set().evaluate(ctx))
 
-    # 2. Medical Condition Keywords
-    critical_conditions = ["diabetes", "celiac", "renal", "kidney", "severe allergy", "anaphylaxis"]
-    profile_conditions = [c.lower() for c in profile.get("conditions", [])]
-    
-    for cond in critical_conditions:
-        if any(cond in c for c in profile_conditions):
-             flags.append(f"Critical Condition: {cond}")
+def assess_risk_batch(items: List[Tuple[dict, List[NutrientRisk], str]]) -> List[RiskAssessment]:
+    """Evaluates many (profile, deficiencies, doctor_notes) triples against one rule set snapshot."""
+    rule_set = get_rule_set()
+    contexts = [RuleContext(profile, deficiencies, notes) for profile, deficiencies, notes in items]
+    return [_decide(hits) for hits in rule_set.evaluate_batch(contexts)]
 
-    if "severe" in doctor_notes.lower() or "hospital" in doctor_notes.lower():
-        flags.append("Recent medical attention noted in doctor notes")
+def _decide(hits: List[RuleHit]) -> RiskAssessment:
+    rule_flags = [RiskFlag(rule_id=rule_id, severity=severity, message=message) for rule_id, severity, message in hits]
+    flags = [f.message for f in rule_flags]
 
-    # 3. Decision Logic
-    if any("Critical" in f for f in flags) or len(flags) > 2:
+    # Decision Logic
+    if any(f.severity == "critical" for f in rule_flags) or len(flags) > 2:
         return RiskAssessment(
             risk_level="HIGH",
             flags=flags,
             can_generate_plan=False,
-            reason="High clinical risk detected. Direct doctor consultation required before AI planning."
+            reason="High clinical risk detected. Direct doctor consultation required before AI planning.",
+            rule_flags=rule_flags
         )
         
     if flags:
@@ -59,7 +53,8 @@ def assess_risk(profile: dict, deficiencies: List[NutrientRisk], doctor_notes: s
             risk_level="MODERATE",
             flags=flags,
             can_generate_plan=True,
-            reason=" Moderate risk. Plan generated with strict supervision flags."
+            reason=" Moderate risk. Plan generated with strict supervision flags.",
+            rule_flags=rule_flags
         )
 
     return RiskAssessment(
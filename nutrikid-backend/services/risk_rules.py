@@ -0,0 +1,279 @@
+import abc
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Rules live next to main.py by default; override with RISK_RULES_PATH
+RULES_PATH = os.getenv(
+    "RISK_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "risk_rules.json")
+)
+
+# (rule_id, severity, message)
+RuleHit = Tuple[str, str, str]
+
+SEVERITIES = ("critical", "warning")
+
+
+class RuleContext:
+    """Per-profile inputs normalised once so every rule reads the same prepared values."""
+
+    __slots__ = ("age", "weight", "conditions_text", "notes_text", "deficiencies")
+
+    def __init__(self, profile: dict, deficiencies: List[Any], doctor_notes: str):
+        self.age = profile.get("age", 5)
+        try:
+            self.weight = float(str(profile.get("weight", "0")).split()[0])  # "20 kg" -> 20.0
+        except (ValueError, IndexError):
+            self.weight = None
+        # Patterns never contain newlines, so a joined string keeps per-condition substring semantics
+        self.conditions_text = "\n".join(c.lower() for c in profile.get("conditions", []))
+        self.notes_text = (doctor_notes or "").lower()
+        self.deficiencies = deficiencies
+
+
+class CompiledRule(abc.ABC):
+    """
+    Specs are checked while compiling, so a malformed rules file fails to load
+    (and hot reload keeps the previous rules) instead of failing on every request.
+    """
+
+    # Placeholders this rule type supplies when formatting its message
+    placeholders: Tuple[str, ...] = ()
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.id = spec.get("id")
+        if not isinstance(self.id, str) or not self.id:
+            raise ValueError(f"Risk rule needs a non-empty string 'id': {spec!r}")
+        self.severity = spec.get("severity", "warning")
+        if self.severity not in SEVERITIES:
+            self._invalid(f"severity must be one of {SEVERITIES}")
+        self.message = spec.get("message")
+        if not isinstance(self.message, str):
+            self._invalid("message must be a string")
+        try:
+            self.message.format(**{name: "" for name in self.placeholders})
+        except (KeyError, IndexError, ValueError) as e:
+            self._invalid(f"message {self.message!r} can only use placeholders {list(self.placeholders)} ({e!r})")
+
+    def _invalid(self, problem: str):
+        raise ValueError(f"Risk rule '{self.id}': {problem}")
+
+    def _number(self, spec: Dict[str, Any], key: str, default: float) -> float:
+        value = spec.get(key, default)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            self._invalid(f"{key} must be a number, got {value!r}")
+        return value
+
+    def _strings(self, spec: Dict[str, Any], key: str, default: Optional[List[str]] = None) -> List[str]:
+        value = spec.get(key, default)
+        if not isinstance(value, list) or not value or not all(isinstance(v, str) and v for v in value):
+            self._invalid(f"{key} must be a non-empty list of strings, got {value!r}")
+        return value
+
+    @abc.abstractmethod
+    def evaluate(self, ctx: RuleContext) -> List[str]:
+        """Returns one message per flag this rule raises for the context."""
+
+
+class _PatternRule(CompiledRule):
+    """Literal substring patterns folded into a single alternation regex."""
+
+    placeholders = ("match",)
+
+    def __init__(self, spec: Dict[str, Any]):
+        super().__init__(spec)
+        self.patterns = [p.lower() for p in self._strings(spec, "patterns")]
+        self.regex = re.compile("|".join(re.escape(p) for p in self.patterns))
+
+
+class ConditionRule(_PatternRule):
+    """One flag per pattern found in any profile condition, in pattern order."""
+
+    def evaluate(self, ctx: RuleContext) -> List[str]:
+        text = ctx.conditions_text
+        # The alternation is only a quick pre-filter: its matches don't overlap, so
+        # "allergy" and "severe allergy" both need their own substring check
+        if not text or not self.regex.search(text):
+            return []
+        return [self.message.format(match=p) for p in self.patterns if p in text]
+
+
+class NotesRule(_PatternRule):
+    """A single flag if any pattern appears in the doctor notes."""
+
+    def evaluate(self, ctx: RuleContext) -> List[str]:
+        match = self.regex.search(ctx.notes_text)
+        return [self.message.format(match=match.group(0))] if match else []
+
+
+class WeightRule(CompiledRule):
+    """Very rough underweight check: weight < age * factor + offset."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        super().__init__(spec)
+        self.min_age = self._number(spec, "min_age", 1)
+        self.factor = float(self._number(spec, "factor", 2))
+        self.offset = float(self._number(spec, "offset", 5))
+
+    def evaluate(self, ctx: RuleContext) -> List[str]:
+        if ctx.weight is None or not ctx.age > self.min_age:
+            return []
+        if ctx.weight < ctx.age * self.factor + self.offset:
+            return [self.message.format()]
+        return []
+
+
+class DeficiencyRule(CompiledRule):
+    """Flags when at least `min_count` deficiencies have one of the given statuses."""
+
+    placeholders = ("nutrients",)
+
+    def __init__(self, spec: Dict[str, Any]):
+        super().__init__(spec)
+        self.statuses = frozenset(self._strings(spec, "statuses", ["Very Low"]))
+        self.min_count = int(self._number(spec, "min_count", 1))
+        if self.min_count < 1:
+            self._invalid("min_count must be at least 1")
+
+    def evaluate(self, ctx: RuleContext) -> List[str]:
+        nutrients = [d.nutrient for d in ctx.deficiencies if d.status in self.statuses]
+        if len(nutrients) >= self.min_count:
+            return [self.message.format(nutrients=", ".join(nutrients))]
+        return []
+
+
+RULE_TYPES = {
+    "condition": ConditionRule,
+    "notes": NotesRule,
+    "weight": WeightRule,
+    "deficiency": DeficiencyRule,
+}
+
+
+class RuleSet:
+    def __init__(self, rules: List[CompiledRule], version: Any = None, source: Optional[str] = None):
+        self.rules = rules
+        self.version = version
+        self.source = source
+        self.loaded_at = time.time()
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any], source: Optional[str] = None) -> "RuleSet":
+        if not isinstance(spec, dict) or not isinstance(spec.get("rules", []), list):
+            raise ValueError("Risk rules file must be an object with a 'rules' list")
+        rules = []
+        for rule_spec in spec.get("rules", []):
+            if not isinstance(rule_spec, dict):
+                raise ValueError(f"Risk rule must be an object, got {rule_spec!r}")
+            enabled = rule_spec.get("enabled", True)
+            if not isinstance(enabled, bool):
+                raise ValueError(f"Risk rule '{rule_spec.get('id')}': enabled must be true or false")
+            if not enabled:
+                continue
+            rule_type = rule_spec.get("type")
+            if rule_type not in RULE_TYPES:
+                raise ValueError(f"Unknown risk rule type '{rule_type}' in rule '{rule_spec.get('id')}'")
+            rules.append(RULE_TYPES[rule_type](rule_spec))
+        return cls(rules, version=spec.get("version"), source=source)
+
+    def evaluate(self, ctx: RuleContext) -> List[RuleHit]:
+        """Runs every rule once against a prepared context, recording cost and hits per rule."""
+        hits = []
+        for rule in self.rules:
+            start = time.perf_counter()
+            messages = rule.evaluate(ctx)
+            _record(rule.id, time.perf_counter() - start, len(messages))
+            hits.extend((rule.id, rule.severity, m) for m in messages)
+        return hits
+
+    def evaluate_batch(self, contexts: List[RuleContext]) -> List[List[RuleHit]]:
+        return [self.evaluate(ctx) for ctx in contexts]
+
+
+# =============================
+# Loading / Hot Reload
+# =============================
+_rule_set: Optional[RuleSet] = None
+_rule_mtime: Optional[int] = None
+_load_lock = threading.Lock()
+
+
+def load_rules(path: Optional[str] = None) -> RuleSet:
+    path = path or RULES_PATH
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    return RuleSet.from_spec(spec, source=path)
+
+
+def get_rule_set() -> RuleSet:
+    """
+    Returns the compiled rule set, recompiling when the rules file changes on disk.
+    A broken edit keeps the previously compiled rules active.
+    """
+    global _rule_set, _rule_mtime
+
+    try:
+        mtime = os.stat(RULES_PATH).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    if _rule_set is not None and (mtime is None or mtime == _rule_mtime):
+        return _rule_set
+
+    with _load_lock:
+        if _rule_set is not None and mtime == _rule_mtime:
+            return _rule_set
+        try:
+            _rule_set = load_rules()
+            _rule_mtime = mtime
+            print(f"Loaded {len(_rule_set.rules)} risk rules from {RULES_PATH}")
+        except Exception as e:
+            if _rule_set is None:
+                raise RuntimeError(f"Risk rules could not be loaded from {RULES_PATH}: {e}")
+            # Don't retry the same broken file on every request
+            _rule_mtime = mtime
+            print(f"Warning: Failed to reload risk rules ({e}). Keeping previous rule set.")
+    return _rule_set
+
+
+# =============================
+# Rule Metrics
+# =============================
+_rule_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _record(rule_id: str, elapsed: float, hit_count: int):
+    stats = _rule_stats.get(rule_id)
+    if stats is None:
+        stats = _rule_stats[rule_id] = {"evaluations": 0, "hits": 0, "total_seconds": 0.0}
+    stats["evaluations"] += 1
+    stats["hits"] += 1 if hit_count else 0
+    stats["total_seconds"] += elapsed
+
+
+def get_rule_stats() -> Dict[str, Any]:
+    """Evaluation count, hit rate and average cost per rule ID."""
+    rules = {}
+    for rule_id, stats in _rule_stats.items():
+        evaluations = stats["evaluations"] or 1
+        rules[rule_id] = {
+            "evaluations": int(stats["evaluations"]),
+            "hits": int(stats["hits"]),
+            "hit_rate": round(stats["hits"] / evaluations, 4),
+            "avg_us": round(stats["total_seconds"] / evaluations * 1e6, 2),
+        }
+    rule_set = _rule_set
+    return {
+        "source": rule_set.source if rule_set else None,
+        "version": rule_set.version if rule_set else None,
+        "loaded_at": rule_set.loaded_at if rule_set else None,
+        "rules": rules,
+    }
+
+
+def reset_rule_stats():
+    _rule_stats.clear()
@@ -0,0 +1,58 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+
+def request_key(payload: Any) -> str:
+    """Canonical hash of a request body: key order and whitespace don't matter."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    De-duplicates identical in-flight work (double taps, frontend retries).
+
+    The first caller for a key starts the computation as its own task; callers that
+    arrive while it is running await that same task and share its result or error.
+    Nothing is kept once the task finishes, so this is not a result cache.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    async def do(self, namespace: str, payload: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+        key = f"{namespace}:{request_key(payload)}"
+        stats = self._stats.setdefault(namespace, {"executed": 0, "coalesced": 0})
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            stats["executed"] += 1
+        else:
+            stats["coalesced"] += 1
+
+        # Shield so one client disconnecting doesn't cancel the work others are waiting on
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        namespaces = {}
+        for namespace, stats in self._stats.items():
+            total = stats["executed"] + stats["coalesced"]
+            namespaces[namespace] = {
+                **stats,
+                "coalesced_rate": round(stats["coalesced"] / total, 4) if total else 0.0,
+                "in_flight": sum(1 for key in self._inflight if key.startswith(namespace + ":")),
+            }
+        return namespaces
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,206 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional, Type
+from pydantic import BaseModel, ValidationError
+
+_CLOSERS = {"{": "}", "[": "]"}
+# Characters that may follow an opener, colon or comma in valid JSON
+_KEY_START = frozenset('"}')
+_NEXT_KEY = frozenset('"')
+_VALUE_START = frozenset('"{[-0123456789tfn')
+
+# Upper bound on truncation-repair attempts, newest cut point first
+MAX_REPAIR_ATTEMPTS = 32
+# Repair may close the top-level object and the containers directly inside it
+# (e.g. a list of deficiencies); anything nested deeper, such as one list item,
+# is kept whole or dropped whole, never cut open.
+REPAIR_DEPTH = 2
+
+
+class JsonObjectScanner:
+    """
+    Incremental balanced-brace scanner for JSON objects embedded in model text.
+
+    Feed it chunks as they arrive (or the whole response at once); it returns each
+    top-level {...} once its closing brace is seen. Strings and escapes are tracked,
+    so braces inside values don't confuse it, and there is no regex backtracking:
+    every character is looked at once.
+    """
+
+    def __init__(self):
+        self._obj: List[str] = []   # chunks of the object currently being scanned
+        self._obj_len = 0
+        self._stack: List[str] = []  # expected closers, innermost last
+        self._in_string = False
+        self._escape = False
+        # (length of object text to keep, closers to append) at each complete-value boundary
+        self._cuts: List[tuple] = []
+        # Set of characters allowed next (after {, [, : or ,); None when anything goes
+        self._expect: Optional[frozenset] = None
+        # The open candidate has already broken JSON syntax (e.g. "{placeholder ...")
+        self._malformed = False
+
+    @property
+    def truncated(self) -> bool:
+        """An object is still open and everything in it so far is valid JSON."""
+        return bool(self._stack) and not self._malformed
+
+    def feed(self, chunk: str) -> List[str]:
+        completed = []
+        i, n = 0, len(chunk)
+        while i < n:
+            if not self._stack:
+                start = chunk.find("{", i)
+                if start == -1:
+                    return completed
+                self._reset()
+                i = start
+
+            seg_start = i
+            while i < n:
+                ch = chunk[i]
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif ch == "\\":
+                        self._escape = True
+                    elif ch == '"':
+                        self._in_string = False
+                    i += 1
+                    continue
+                if self._expect is not None and not ch.isspace():
+                    if ch not in self._expect:
+                        self._malformed = True
+                    self._expect = None
+                if ch == '"':
+                    self._in_string = True
+                elif ch == "{" or ch == "[":
+                    # No cut after an opener: an empty container would invent a value
+                    self._stack.append(_CLOSERS[ch])
+                    self._expect = _KEY_START if ch == "{" else _VALUE_START | {"]"}
+                elif ch == ":":
+                    self._expect = _VALUE_START
+                elif ch == "}" or ch == "]":
+                    if self._stack[-1] != ch:
+                        # Mismatched bracket: not JSON, drop this candidate and keep scanning
+                        self._reset()
+                        i += 1
+                        break
+                    self._stack.pop()
+                    if not self._stack:
+                        self._obj.append(chunk[seg_start:i + 1])
+                        completed.append("".join(self._obj))
+                        self._reset()
+                        i += 1
+                        break
+                    if len(self._stack) <= REPAIR_DEPTH:
+                        self._cuts.append((self._obj_len + i - seg_start + 1, "".join(reversed(self._stack))))
+                elif ch == ",":
+                    self._expect = _NEXT_KEY if self._stack[-1] == "}" else _VALUE_START
+                    if len(self._stack) <= REPAIR_DEPTH:
+                        self._cuts.append((self._obj_len + i - seg_start, "".join(reversed(self._stack))))
+                i += 1
+            else:
+                self._obj.append(chunk[seg_start:])
+                self._obj_len += n - seg_start
+        return completed
+
+    def repair(self) -> Optional[str]:
+        """
+        Closes a truncated object at the last complete value that still parses.
+        Partial trailing values are dropped rather than guessed at: a half-written
+        list item or nested object falls back to the comma before it.
+        """
+        if not self._stack:
+            return None
+        text = "".join(self._obj)
+        for length, closers in reversed(self._cuts[-MAX_REPAIR_ATTEMPTS:]):
+            candidate = text[:length].rstrip().rstrip(",") + closers
+            try:
+                json.loads(candidate)
+                return candidate
+            except json.JSONDecodeError:
+                continue
+        return None
+
+    def _reset(self):
+        self._obj, self._obj_len, self._cuts = [], 0, []
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._expect = None
+        self._malformed = False
+
+
+class ExtractionResult(BaseModel):
+    data: Optional[Dict[str, Any]] = None  # parsed JSON (before schema validation)
+    value: Optional[Any] = None  # validated schema instance, when everything passed
+    repaired: bool = False  # True when a truncated object had to be closed
+    failed_fields: List[str] = []  # dotted paths that are missing or invalid
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.value is not None
+
+
+def extract_json(chunks: Iterable[str], schema: Optional[Type[BaseModel]] = None, _stray_braces: int = 2) -> ExtractionResult:
+    """
+    Pulls the first JSON object out of model output and validates it against `schema`.
+
+    `chunks` may be the full response string or an iterator of streamed text pieces;
+    reading stops as soon as an object that parses (and validates, if possible) is found.
+    """
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+
+    scanner = JsonObjectScanner()
+    fallback: Optional[ExtractionResult] = None
+    seen = []
+    for chunk in chunks:
+        seen.append(chunk)
+        for candidate in scanner.feed(chunk):
+            try:
+                data = json.loads(candidate)
+            except json.JSONDecodeError:
+                continue  # e.g. "{placeholder}" prose before the real object
+            if not isinstance(data, dict):
+                continue
+            result = _validate(data, schema, repaired=False)
+            if result.ok or schema is None:
+                return result
+            if fallback is None or len(result.failed_fields) < len(fallback.failed_fields):
+                fallback = result
+
+    if fallback is not None:
+        return fallback
+
+    repaired = scanner.repair()
+    if repaired is not None:
+        return _validate(json.loads(repaired), schema, repaired=True)
+
+    # A valid JSON prefix that was cut off too early to close; skipping its "{" would
+    # promote a nested object to the top level and misreport the failed fields
+    if scanner.truncated:
+        return ExtractionResult(error="JSON object was truncated and could not be repaired.")
+
+    # An unmatched "{" in prose swallows the real object; skip past it and try again
+    text = "".join(seen)
+    first = text.find("{")
+    if first != -1 and _stray_braces > 0:
+        return extract_json(text[first + 1:], schema, _stray_braces - 1)
+
+    return ExtractionResult(error="No JSON object found in model output.")
+
+
+def _validate(data: Dict[str, Any], schema: Optional[Type[BaseModel]], repaired: bool) -> ExtractionResult:
+    if schema is None:
+        return ExtractionResult(data=data, value=data, repaired=repaired)
+    try:
+        return ExtractionResult(data=data, value=schema(**data), repaired=repaired)
+    except ValidationError as e:
+        failed = []
+        for err in e.errors():
+            path = ".".join(str(part) for part in err["loc"])
+            if path not in failed:
+                failed.append(path)
+        return ExtractionResult(data=data, repaired=repaired, failed_fields=failed, error=str(e))